@@ -1,9 +1,24 @@
 PLOT_SAVE = True
+# Only parse the pings newer than the last run, for weekly re-exports that only add messages
+APPEND = False
+# Processes rendering figures at once, None uses every core and 0 renders them one at a time
+RENDER_WORKERS = None
+# Time every stage and plot, written to profile.json with a summary at the end
+PROFILE = False
 
-import json
 import datetime
 import zoneinfo
+import numpy as np
 import matplotlib.pyplot as plt
+from matplotlib.collections import LineCollection
+
+from ingest import iter_messages, export_files, coffee_emoji, coffee_emoji_steffan, variant_code
+from cache import load_pings
+from render import Figure, render, plot_path
+from localtime import Calendar, year_cuts_ms
+from groups import group_size_sweep, suggest_threshold
+from distribution import Distribution
+import instrument
 
 def to_datetime(unix_ms): return datetime.datetime.fromtimestamp(unix_ms // 1000, tz=zoneinfo.ZoneInfo("Europe/Copenhagen"))
 
@@ -30,7 +45,7 @@ if PLOT_SAVE:
     def save():
         global name
         assert name is not None
-        plt.savefig(f"plot_{name}.pgf", bbox_inches='tight')
+        plt.savefig(plot_path(name), bbox_inches='tight')
         plt.clf()
         name = None
     plt.show = save
@@ -57,23 +72,21 @@ def add_labels(xs, int_values, offset, neg_offset=None, rotate=False):
         plt.text(x, c + offset if c >= 0 else c - neg_offset, c, **kwargs)
 
 
-def year_range(dates):
-    return f"{dates[-1].year}-{dates[0].year}"
+def year_range(pings):
+    return f"{pings.local.year[0]}-{pings.local.year[-1]}"
 
 
-def plot_weekday_analysis(dates, diff=None):
-    name_tail = year_range(dates) + (f"_diff_{year_range(diff)}" if diff is not None else "")
+def plot_weekday_analysis(pings, diff=None):
+    name_tail = year_range(pings) + (f"_diff_{year_range(diff)}" if diff is not None else "")
 
-    weekday_count = [0] * 7
-    for date in dates:
-        weekday_count[date.weekday()] += 1
-    
+    histograms = pings.histograms()
     if diff is not None:
-        for date in diff:
-            weekday_count[date.weekday()] -= 1
-        
+        histograms = histograms - diff.histograms()
+
         plt.axhline(y=0, color='black', linestyle='-')
 
+    weekday_count = histograms.weekday.tolist()
+
     plt.bar(range(7), weekday_count, color="grey")
     weekday_names = ["Mandag", "Tirsdag", "Onsdag", "Torsdag", "Fredag", "Lørdag", "Søndag"]
     plt.xticks(range(7), weekday_names, rotation=90, ha="right", va="center", rotation_mode="anchor")
@@ -84,14 +97,7 @@ def plot_weekday_analysis(dates, diff=None):
     plt.set_name(f"weekday_analysis_{name_tail}")
     plt.show()
 
-    weekday_hour_count = [[0] * 24 for _ in range(7)]
-    for date in dates:
-        weekday_hour_count[date.weekday()][date.hour] += 1
-    
-    if diff is not None:
-        for date in diff:
-            weekday_hour_count[date.weekday()][date.hour] -= 1
-
+    weekday_hour_count = histograms.weekday_hour.tolist()
     for i, day in enumerate(weekday_hour_count):
         off = 24 * i
         # plt.bar(range(off, off + 24), day, align='edge', width=1.0)
@@ -117,38 +123,39 @@ def plot_weekday_analysis(dates, diff=None):
     plt.show()
 
 
-def plot_weeknumber_over_year_analysis(dates, diff=None):
-    pings_pr_weeknumber = [0] * 53
-    for date in dates:
-        pings_pr_weeknumber[date.isocalendar().week] += 1
-    
+def plot_weeknumber_over_year_analysis(pings, diff=None):
+    name_tail = year_range(pings) + (f"_diff_{year_range(diff)}" if diff is not None else "")
+
+    histograms = pings.histograms()
     if diff is not None:
-        for date in diff:
-            pings_pr_weeknumber[date.isocalendar().week] -= 1
+        histograms = histograms - diff.histograms()
 
-    plt.bar(range(1, 53), pings_pr_weeknumber[1:], color="grey")
+    # Week 53 only exists in some years, so only give it a bar when it has pings
+    pings_pr_weeknumber = histograms.week.tolist()
+    if pings_pr_weeknumber[53] == 0:
+        pings_pr_weeknumber = pings_pr_weeknumber[:53]
+
+    plt.bar(range(1, len(pings_pr_weeknumber)), pings_pr_weeknumber[1:], color="grey")
     plt.xlabel("Uge nummer")
     plt.ylabel("Antal pings", labelpad=10)
     # add_labels(range(7), weekday_count, 4, neg_offset=10)
     plt.tight_layout()
-    # plt.set_name(f"weekday_analysis_{name_tail}")
+    plt.set_name(f"weeknumber_analysis_{name_tail}")
     plt.show()
 
 
-def plot_year_analysis(dates, diff=None, named=None, day_count_tests=[], label_height=4):
-    name_tail = year_range(dates) + (f"_diff_{year_range(diff)}" if diff is not None else "")
+def plot_year_analysis(pings, diff=None, named=None, day_count_tests=[], label_height=4):
+    name_tail = year_range(pings) + (f"_diff_{year_range(diff)}" if diff is not None else "")
     if named is not None: name_tail = named
 
-    month_count = [0] * 12
-    for date in dates:
-        month_count[date.month - 1] += 1
-    
+    histograms = pings.histograms()
     if diff is not None:
-        for date in diff:
-            month_count[date.month - 1] -= 1
-        
+        histograms = histograms - diff.histograms()
+
         plt.axhline(y=0, color='black', linestyle='-')
 
+    month_count = histograms.month.tolist()
+
     month_names = ["Januar", "Februar", "Marts", "April", "Maj", "Juni", "Juli", "August", "September", "Oktober", "November", "December"]
     plt.bar(range(12), month_count, color="grey")
     plt.xticks(range(12), month_names, rotation=90, ha="right", va="center", rotation_mode="anchor")
@@ -160,14 +167,8 @@ def plot_year_analysis(dates, diff=None, named=None, day_count_tests=[], label_h
     plt.show()
     
     days_in_month = [31, 29, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31]
-    month_day_count = [[0] * days for days in days_in_month]
-    for date in dates:
-        month_day_count[date.month - 1][date.day - 1] += 1
-    
+    month_day_count = histograms.month_days()
     if diff is not None:
-        for date in diff:
-            month_day_count[date.month - 1][date.day - 1] -= 1
-        
         plt.axhline(y=0, color='black', linestyle='-')
 
     for test in day_count_tests:
@@ -200,18 +201,16 @@ def plot_year_analysis(dates, diff=None, named=None, day_count_tests=[], label_h
     plt.show()
 
 
-def plot_weekday_and_month_side_by_side(dates_1, dates_2):
-    name_tail = year_range(dates_1) + "_" + year_range(dates_2)
+def plot_weekday_and_month_side_by_side(pings_1, pings_2):
+    name_tail = year_range(pings_1) + "_" + year_range(pings_2)
+    histograms = [pings_1.histograms(), pings_2.histograms()]
 
     width = 0.4
     padding = 0.0
 
     weekday_counts = []
-    for i, (dates, color) in enumerate([(dates_1, "gray"), (dates_2, "lightgray")]):
-        weekday_count = [0] * 7
-        for date in dates:
-            weekday_count[date.weekday()] += 1
-        
+    for i, (period, color) in enumerate([(histograms[0], "gray"), (histograms[1], "lightgray")]):
+        weekday_count = period.weekday.tolist()
         offset = -width / 2 - padding / 2 + (width + padding) * i
         plt.bar([x + offset for x in range(7)], weekday_count, width, color=color)
 
@@ -232,11 +231,8 @@ def plot_weekday_and_month_side_by_side(dates_1, dates_2):
 
 
     month_counts = []
-    for i, (dates, color) in enumerate([(dates_1, "gray"), (dates_2, "lightgray")]):
-        month_count = [0] * 12
-        for date in dates:
-            month_count[date.month - 1] += 1
-        
+    for i, (period, color) in enumerate([(histograms[0], "gray"), (histograms[1], "lightgray")]):
+        month_count = period.month.tolist()
         offset = -width / 2 - padding / 2 + (width + padding) * i
         plt.bar([x + offset for x in range(12)], month_count, width, color=color)
 
@@ -256,17 +252,14 @@ def plot_weekday_and_month_side_by_side(dates_1, dates_2):
     plt.show()
 
 
-def plot_weekday_hour_on_top(dates_1, dates_2):
-    name_tail = year_range(dates_1) + "_" + year_range(dates_2)
+def plot_weekday_hour_on_top(pings_1, pings_2):
+    name_tail = year_range(pings_1) + "_" + year_range(pings_2)
 
     min_entry = float("inf")
     max_entry = -float("inf")
 
-    for dates, sign in (dates_1, 1), (dates_2, -1):
-        weekday_hour_count = [[0] * 24 for _ in range(7)]
-        for date in dates:
-            weekday_hour_count[date.weekday()][date.hour] += 1
-
+    for pings, sign in (pings_1, 1), (pings_2, -1):
+        weekday_hour_count = pings.histograms().weekday_hour.tolist()
         for i, day in enumerate(weekday_hour_count):
             off = 24 * i
             day_data = [h * sign for h in day]
@@ -302,13 +295,8 @@ def plot_weekday_hour_on_top(dates_1, dates_2):
     plt.show()
 
 
-def plot_weekday_hour_super_imposed(dates_1, dates_2):
-    weekday_hour_counts = []
-    for dates in dates_1, dates_2:
-        weekday_hour_count = [[0] * 24 for _ in range(7)]
-        for date in dates:
-            weekday_hour_count[date.weekday()][date.hour] += 1
-        weekday_hour_counts.append(weekday_hour_count)
+def plot_weekday_hour_super_imposed(pings_1, pings_2):
+    weekday_hour_counts = [pings.histograms().weekday_hour.tolist() for pings in (pings_1, pings_2)]
 
     for i, (day_1, day_2) in enumerate(zip(*weekday_hour_counts)):
         off = 24 * i
@@ -349,35 +337,17 @@ def plot_weekday_hour_super_imposed(dates_1, dates_2):
 
     plt.ylim([0, max_entry])
     plt.ylabel("Antal pings", labelpad=10)
-    name_tail = year_range(dates_1) + "_" + year_range(dates_2)
+    name_tail = year_range(pings_1) + "_" + year_range(pings_2)
     plt.set_name(f"weekday_analysis_hour_imposed_{name_tail}")
     plt.show()
 
 
-def plot_count_days_with_certain_pings(dates):
-    days_in_month = [31, 29, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31]
-    all_dates = [
-        (year, month, day)
-        for year in [2022, 2023, 2024]
-        for month, count in enumerate(days_in_month, start=1)
-        for day in range(1, count + 1 - int(year != 2024 and month == 2))
-    ]
-
-    # TODO: hardcoded
-    observe_dates = all_dates[261:-104]
-
-    # print(dates[-1], dates[0])
-    # print(observe_dates[0], observe_dates[-1])
-
-    from collections import defaultdict
-    observations = defaultdict(lambda: 0)
-    for date in dates:
-        observations[date.year, date.month, date.day] += 1
+def plot_count_days_with_certain_pings(pings, calendar=None):
+    calendar = calendar if calendar is not None else Calendar.of(pings.local)
+    observations = calendar.counts(pings.local.day)
 
-    max_count = max(observations.values())
-    count_count = [0] * (max_count + 1)
-    for date in observe_dates:
-        count_count[observations[date]] += 1
+    count_count = np.bincount(observations).tolist()
+    max_count = len(count_count) - 1
 
     total = sum(count_count)
 
@@ -394,18 +364,17 @@ def plot_count_days_with_certain_pings(dates):
     import matplotlib.ticker as mtick
     plt.gca().yaxis.set_major_formatter(mtick.PercentFormatter(1))
 
-    full_data = [v for v, c in enumerate(count_count) for _ in range(c)]
-    assert len(full_data) == total
-    median = full_data[len(full_data) // 2]
-    average = sum(full_data) / len(full_data)
-    variance = sum((x - average)**2 for x in full_data) / len(full_data)
+    distribution = Distribution(count_count)
+    assert distribution.total == total
+    median = int(distribution.median)
+    average = float(distribution.mean)
+    variance = float(distribution.variance)
     sd = variance**.5
     print("Median:", median)
     print("Average:", average)
     print("Variance:", variance)
     print("SD:", sd)
 
-    import numpy as np
     import scipy.stats as stats
     import math
 
@@ -424,62 +393,37 @@ def plot_count_days_with_certain_pings(dates):
     plt.show()
 
 
-def plot_cummulative_year_analysis(dates, named=None):
-    # TODO: hardcoded
-    days_in_month = [31, 29, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31]
-    all_dates = [
-        (year, month, day)
-        for year in [2022, 2023, 2024]
-        for month, count in enumerate(days_in_month, start=1)
-        for day in range(1, count + 1 - int(year != 2024 and month == 2))
-    ]
-
-    # TODO: hardcoded
-    observe_dates = all_dates[261:-104]
-
-    # print(dates[-1], dates[0])
-    # print(observe_dates[0], observe_dates[-1])
-
-    from collections import defaultdict
-    observations = defaultdict(lambda: 0)
-    for date in dates:
-        observations[date.year, date.month, date.day] += 1
-    
-    total = 0
-    data_line = []
-    for date in observe_dates:
-        total += observations[date]
-        data_line.append(total)
-    
-    plt.plot(range(len(observe_dates)), data_line, "-", color="black")
-    plt.plot([0, len(observe_dates) - 1], [0, len(dates)], ":", color="gray")
-    plt.ylabel("Antal pings", labelpad=10)
-
+def add_calendar_ticks(calendar, year_label_lines, separator_length):
+    # Month names in the middle of every month, the years below them and a long tick between the years
     month_names = ["Januar", "Februar", "Marts", "April", "Maj", "Juni", "Juli", "August", "September", "Oktober", "November", "December"]
-    month_ticks = []
-    for i, (year, month, day) in enumerate(observe_dates):
-        if (days_in_month[month - 1] - int(year != 2024 and month == 2)) // 2 == day:
-            month_ticks.append((i, f"{month_names[month - 1]}"))
-    plt.xticks(*zip(*month_ticks), rotation=90, ha="right", va="center", rotation_mode="anchor")
+    mid_month = np.flatnonzero(calendar.monthday == calendar.month_length // 2)
+    plt.xticks(mid_month.tolist(), [month_names[month - 1] for month in calendar.month[mid_month].tolist()], rotation=90, ha="right", va="center", rotation_mode="anchor")
 
     year_ticks = []
-    for y in [2022, 2023, 2024]:
-        iss = [i for i, (year, _, _) in enumerate(observe_dates) if year == y]
-        min_i = min(iss)
-        max_i = max(iss)
-        year_ticks.append(((min_i + max_i) / 2, f"\n\n\n\n{y}"))
+    for y in np.unique(calendar.year).tolist():
+        iss = np.flatnonzero(calendar.year == y)
+        min_i = int(iss[0])
+        max_i = int(iss[-1])
+        year_ticks.append(((min_i + max_i) / 2, "\n" * year_label_lines + f"{y}"))
     sec = plt.gca().secondary_xaxis(location=0)
     sec.set_xticks(*zip(*year_ticks))
     sec.tick_params('x', length=0)
 
     sec2 = plt.gca().secondary_xaxis(location=0)
-    sep = []
-    for y1, y2 in [(2022, 2023), (2023, 2024)]:
-        a = max(i for i, (y, _, _) in enumerate(observe_dates) if y == y1)
-        b = min(i for i, (y, _, _) in enumerate(observe_dates) if y == y2)
-        sep.append((a + b) / 2)
+    sep = (np.flatnonzero(np.diff(calendar.year)) + 0.5).tolist()
     sec2.set_xticks(sep, labels=[])
-    sec2.tick_params('x', length=80, width=1)
+    sec2.tick_params('x', length=separator_length, width=1)
+
+
+def plot_cummulative_year_analysis(pings, named=None, calendar=None):
+    calendar = calendar if calendar is not None else Calendar.of(pings.local)
+    data_line = np.cumsum(calendar.counts(pings.local.day)).tolist()
+
+    plt.plot(range(len(calendar)), data_line, "-", color="black")
+    plt.plot([0, len(calendar) - 1], [0, len(pings)], ":", color="gray")
+    plt.ylabel("Antal pings", labelpad=10)
+
+    add_calendar_ticks(calendar, 4, 80)
 
     name = "cummulative_sum_vs_average"
     if named is not None: name += "_" + named
@@ -488,73 +432,26 @@ def plot_cummulative_year_analysis(dates, named=None):
     plt.show()
 
 
-def plot_double_cummulative_year_analysis(dates, single_dates, named):
-    # TODO: hardcoded
-    days_in_month = [31, 29, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31]
-    all_dates = [
-        (year, month, day)
-        for year in [2022, 2023, 2024]
-        for month, count in enumerate(days_in_month, start=1)
-        for day in range(1, count + 1 - int(year != 2024 and month == 2))
-    ]
-
-    # TODO: hardcoded
-    observe_dates = all_dates[261:-104]
-
-    data = []
-    for dates in dates, single_dates:
-        from collections import defaultdict
-        observations = defaultdict(lambda: 0)
-        for date in dates:
-            observations[date.year, date.month, date.day] += 1
-        
-        total = 0
-        data_line = []
-        for date in observe_dates:
-            total += observations[date]
-            data_line.append(total)
-        
-        data.append(data_line)
-    
+def plot_double_cummulative_year_analysis(pings, person, named, calendar=None):
+    # The whole chat against one person, both from the same senders x days counts
+    calendar = calendar if calendar is not None else Calendar.of(pings.local)
+    cumulative = np.cumsum(pings.sender_day_counts(calendar), axis=1)
+    data = [cumulative.sum(axis=0).tolist(), cumulative[pings.sender_id(person)].tolist()]
+
     scale = data[0][-1] / data[1][-1]
-    plt.plot([0, len(observe_dates) - 1], [0, data[0][-1]], ":", color="lightgray")
-    plt.plot(range(len(observe_dates)), data[0], "-", color="black")
-    plt.plot(range(len(observe_dates)), [d * scale for d in data[1]], "-", color="gray")
+    plt.plot([0, len(calendar) - 1], [0, data[0][-1]], ":", color="lightgray")
+    plt.plot(range(len(calendar)), data[0], "-", color="black")
+    plt.plot(range(len(calendar)), [d * scale for d in data[1]], "-", color="gray")
 
-    plt.xlim([-1, len(observe_dates)])
+    plt.xlim([-1, len(calendar)])
     plt.ylim([-1, data[0][-1] + 1])
 
     plt.ylabel("Antal pings", labelpad=10)
     ysec = plt.gca().secondary_yaxis('right', functions=(lambda y: y/scale, lambda y: y/scale))
     ysec.set_ylabel("Steffan antal pings", labelpad=0)
 
-    month_names = ["Januar", "Februar", "Marts", "April", "Maj", "Juni", "Juli", "August", "September", "Oktober", "November", "December"]
-    month_ticks = []
-    for i, (year, month, day) in enumerate(observe_dates):
-        if (days_in_month[month - 1] - int(year != 2024 and month == 2)) // 2 == day:
-            month_ticks.append((i, f"{month_names[month - 1]}"))
-    plt.xticks(*zip(*month_ticks), rotation=90, ha="right", va="center", rotation_mode="anchor")
-
-    year_ticks = []
-    for y in [2022, 2023, 2024]:
-        iss = [i for i, (year, _, _) in enumerate(observe_dates) if year == y]
-        min_i = min(iss)
-        max_i = max(iss)
-        year_ticks.append(((min_i + max_i) / 2, f"\n\n\n\n\n{y}"))
-        # year_ticks.append(((min_i + max_i) / 2, f"\n\n\n\n\n\n{y}"))
-    sec = plt.gca().secondary_xaxis(location=0)
-    sec.set_xticks(*zip(*year_ticks))
-    sec.tick_params('x', length=0)
-
-    sec2 = plt.gca().secondary_xaxis(location=0)
-    sep = []
-    for y1, y2 in [(2022, 2023), (2023, 2024)]:
-        a = max(i for i, (y, _, _) in enumerate(observe_dates) if y == y1)
-        b = min(i for i, (y, _, _) in enumerate(observe_dates) if y == y2)
-        sep.append((a + b) / 2)
-    sec2.set_xticks(sep, labels=[])
-    sec2.tick_params('x', length=60, width=1)
-    # sec2.tick_params('x', length=95, width=1)
+    add_calendar_ticks(calendar, 5, 60)
+    # add_calendar_ticks(calendar, 6, 95)
 
     name = "double_cummulative_sum_vs_average_with_" + named
     plt.set_name(name)
@@ -562,75 +459,82 @@ def plot_double_cummulative_year_analysis(dates, single_dates, named):
     plt.show()
 
 
-def plot_group_sizes():
+def plot_group_sizes(pings):
     # Five minutes
     time_within = 5 * 60 * 1000
 
-    sorted_time = sorted(unix_times)
-    buckets = [[sorted_time[0]]]
-    for t in sorted_time[1:]:
-        if t - buckets[-1][-1] > time_within:
-            buckets.append([])
-        buckets[-1].append(t)
-
-    sizes = [len(b) for b in buckets]
-    max_size = max(sizes)
-    size_count = [0] * (max_size + 1)
-    for s in sizes:
-        size_count[s] += 1
-
+    size_count = pings.groups(time_within).size_count.tolist()
     xs = list(range(1, len(size_count)))
     size_count = size_count[1:]
     plt.bar(xs, size_count, color="grey")
     add_labels(xs, size_count, 4)
+    plt.set_name("group_sizes")
     plt.xlabel("Gruppestørrlse", labelpad=10)
     plt.ylabel("Antal ture", labelpad=10)
     plt.tight_layout()
     plt.show()
 
 
-def plot_group_graf_relation(unix_time_with_sender, line_ticks=20, anonymous=False):
+def plot_group_size_sweep(pings, max_minutes=30):
+    # Group sizes for every window from half a minute to `max_minutes`, to see how much the five minutes matter
+    thresholds = [seconds * 1000 for seconds in range(30, max_minutes * 60 + 1, 30)]
+    size_counts = group_size_sweep(pings.timestamp_ms, thresholds)
+    suggested = suggest_threshold(pings.timestamp_ms)
+    print(f"Suggested group window = {suggested / 60000:.1f} minutes")
+
+    minutes = [threshold / 60000 for threshold in thresholds]
+    for size, label in [(1, "1"), (2, "2"), (3, "3")]:
+        plt.plot(minutes, [size_counts[t][size] if len(size_counts[t]) > size else 0 for t in thresholds], label=label)
+    plt.plot(minutes, [size_counts[t][4:].sum() for t in thresholds], label="4+")
+    plt.axvline(suggested / 60000, color="grey", linestyle=":")
+
+    plt.set_name("group_size_sweep")
+    plt.xlabel("Tidsvindue (minutter)", labelpad=10)
+    plt.ylabel("Antal ture", labelpad=10)
+    plt.legend(title="Gruppestørrelse")
+    plt.tight_layout()
+    plt.show()
+
+
+def plot_group_graf_relation(pings, line_ticks=20, anonymous=False):
     plt.rcParams['font.size'] = 20
 
     # Five minutes
     time_within = 5 * 60 * 1000
 
-    sorted_time_sender = sorted(unix_time_with_sender)
-    buckets = [([sorted_time_sender[0][0]], [sorted_time_sender[0][1]])]
-    for t, s in sorted_time_sender[1:]:
-        if t - buckets[-1][0][-1] > time_within:
-            buckets.append(([], []))
-        buckets[-1][0].append(t)
-        buckets[-1][1].append(s)
-    
-    new_buckets = [b for b in buckets if len(b[0]) >= 2]
-    print("Solo groups =", len(buckets) - len(new_buckets))
-    buckets = new_buckets
+    groups = pings.groups(time_within)
+    is_group = groups.size >= 2
+    print("Solo groups =", int((~is_group).sum()))
 
     # Detect double pings
-    double_count = 0
-    for bts, bss in buckets:
-        if len(bss) > len(set(bss)):
-            double_count += 1
-            # print("!!!", to_datetime(bts[0]), to_datetime(bts[-1]), bss)
-            if len(set(bts)) == 1:
-                assert False
+    is_double = is_group & (groups.distinct(pings.sender) < groups.size)
+    # print("!!!", [(to_datetime(pings.timestamp_ms[s]), to_datetime(pings.timestamp_ms[e - 1])) for s, e in zip(groups.start[is_double], groups.end[is_double])])
+    assert not (is_double & (pings.timestamp_ms[groups.start] == pings.timestamp_ms[groups.end - 1])).any()
+    double_count = int(is_double.sum())
     print("Counting groups:")
     print(f"{double_count = }")
-    print("Total count =", len(buckets))
-
-    all_persons = {s for _, s in unix_time_with_sender}
-    person_weight = {p: 0 for p in all_persons}
-    pair_weights = {(a, b): 0 for a in all_persons for b in all_persons if a < b}
-
-    for _, group in buckets:
-        group = set(group)
-        for a in group:
-            person_weight[a] += 1
-            for b in group:
-                if a < b:
-                    pair_weights[a, b] += 1
-    
+    print("Total count =", int(is_group.sum()))
+
+    all_persons = {pings.senders[s] for s in pings.present_senders()}
+
+    # Co-occurrence of the groups x persons incidence, the diagonal counts the groups of every person and the rest
+    # counts the groups of every pair. Only pairs that have been in a group together are kept.
+    incidence = groups.incidence(pings.sender, len(pings.senders))[is_group]
+    co_occurrence = (incidence.T @ incidence).tocsr()
+    group_count = co_occurrence.diagonal()
+    co_occurrence.setdiag(0)
+    co_occurrence.eliminate_zeros()
+    max_pair_count = co_occurrence.max(axis=1).toarray().ravel()
+
+    person_weight = {p: int(group_count[s]) for s, p in enumerate(pings.senders) if p in all_persons}
+    max_person_group_weight = {p: int(max_pair_count[s]) for s, p in enumerate(pings.senders) if p in all_persons}
+    import scipy.sparse
+    pairs = scipy.sparse.triu(co_occurrence).tocoo()
+    pair_weights = {
+        tuple(sorted((pings.senders[a], pings.senders[b]))): w
+        for a, b, w in zip(pairs.row.tolist(), pairs.col.tolist(), pairs.data.tolist())
+    }
+
     weights = sorted([(w, a, b) for (a, b), w in pair_weights.items()])
     # print(*weights, sep="\n")
 
@@ -654,11 +558,18 @@ def plot_group_graf_relation(unix_time_with_sender, line_ticks=20, anonymous=Fal
                 plt.annotate(greek[i], polar_to_xy(10, i), xytext=polar_to_xy(11.5, i), ha='center')
 
 
+    def draw_lines(segments, greys):
+        # All lines as one artist, lines later in the list are drawn on top
+        lines = LineCollection(segments, colors=[(g, g, g) for g in greys], capstyle="projecting")
+        plt.gca().add_collection(lines)
+        plt.gca().autoscale_view()
+
     max_weight = max(pair_weights.values())
-    for w, a, b in weights:
-        points = [person_to_location[a], person_to_location[b]]
-        plt.plot(*zip(*points), "-", color=str(1-(w/max_weight)))
-    
+    draw_lines(
+        [[person_to_location[a], person_to_location[b]] for w, a, b in weights],
+        [1 - (w / max_weight) for w, a, b in weights],
+    )
+
     annotate()
 
     plt.gca().set_aspect('equal', adjustable='box')
@@ -667,11 +578,6 @@ def plot_group_graf_relation(unix_time_with_sender, line_ticks=20, anonymous=Fal
     plt.set_name("pair_relation_norm_by_max_pair_weight")
     plt.show()
 
-    max_person_group_weight = {
-        p: max(pair_weights[(p, a) if p < a else (a, p)] for a in all_persons if a != p)
-        for p in all_persons
-    }
-
     for normalizer, plot_name in [(person_weight, "pair_relation_norm_by_person_group_count"), (max_person_group_weight, "pair_relation_norm_by_person_max_pair_count")]:
         line_to_plot = []
         for w, a, b in weights:
@@ -692,8 +598,7 @@ def plot_group_graf_relation(unix_time_with_sender, line_ticks=20, anonymous=Fal
         cutoff = 0.95
         line_to_plot = [(c / cutoff, xs, ys) for c, xs, ys in line_to_plot if c <= cutoff]
         print(f"Decrease to {len(line_to_plot)} lines")
-        for c, xs, ys in line_to_plot:
-            plt.plot(xs, ys, "-", color=str(c))
+        draw_lines([list(zip(xs, ys)) for c, xs, ys in line_to_plot], [c for c, xs, ys in line_to_plot])
 
         annotate()
 
@@ -706,15 +611,10 @@ def plot_group_graf_relation(unix_time_with_sender, line_ticks=20, anonymous=Fal
     plt.rcParams['font.size'] = font_default
 
 
-def plot_people_count():
-    # People count
-    from collections import Counter
-    people = [
-        message["sender_name"]
-        for message in coffee_pings
-    ]
-
-    count_tuples = sorted(Counter(people).items(), key=lambda t: t[1])
+def plot_people_count(pings):
+    # People count, senders are interned in order of first appearance like a Counter
+    people_count = np.bincount(pings.sender, minlength=len(pings.senders))
+    count_tuples = sorted(zip(pings.senders, people_count.tolist()), key=lambda t: t[1])
 
     count = [c for _, c in count_tuples]
     labels = [l for l, _ in count_tuples]
@@ -726,224 +626,206 @@ def plot_people_count():
     plt.xticks(xs, labels, rotation=60, ha="right", va="center", rotation_mode="anchor")
     # plt.xticks(xs, xs)
     # plt.xticks([], [])
+    plt.set_name("people_count")
     plt.ylabel("Antal pings", labelpad=10)
     plt.tight_layout()
     plt.show()
 
 
-def plot_people_count_time_sensitive():
-    from collections import defaultdict
+def plot_people_count_time_sensitive(pings, calendar=None):
+    calendar = calendar if calendar is not None else Calendar.of(pings.local)
 
-    people_pings = defaultdict(lambda: [])
-    for message in coffee_pings:
-        people_pings[message["sender_name"]].append(to_datetime(message["timestamp_ms"]))
-    
-    days_in_month = [31, 29, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31]
-    dates = [
-        (year, month, day)
-        for year in [2022, 2023]
-        for month, count in enumerate(days_in_month, start=1)
-        for day in range(1, count + 1)
-    ]
-
-    # TODO: HARDCODED
-    dates = dates[261:-104]
-
-    for person, pings in people_pings.items():
-        date_count = defaultdict(lambda: 0)
-        for t in pings:
-            date_count[(t.year, t.month, t.day)] += 1
-        
-        data_line = []
-        c = 0
-        for d in dates:
-            c += date_count[d]
-            data_line.append(c)
-        
-        plt.plot(range(len(dates)), data_line, "-", label=person)
+    cumulative = np.cumsum(pings.sender_day_counts(calendar), axis=1)
+    for person, data_line in zip(pings.senders, cumulative):
+        plt.plot(range(len(calendar)), data_line, "-", label=person)
 
+    dates = list(zip(calendar.year.tolist(), calendar.month.tolist(), calendar.monthday.tolist()))
     i = 20
     plt.xticks(range(0, len(dates), i), dates[::i], rotation=90, ha="right", va="center", rotation_mode="anchor")
+    plt.set_name("people_count_time_sensitive")
     plt.legend()
     plt.tight_layout()
     plt.show()
 
 
-with open("message_1.json") as f:
-    data = json.load(f)
-
-
-coffee_emoji = "\u00e2\u0098\u0095\u00ef\u00b8\u008f"
-coffee_emoji_steffan = "\u00e2\u0098\u0095\u00ef\u00b8\u008e"
-coffee_emoji_no_tail = "\u00e2\u0098\u0095"
-assert data["messages"][0]["content"] == coffee_emoji
-assert all(not ("content" in message and message["content"] == coffee_emoji_steffan) for message in data["messages"])
-
+# The people singled out in the article's figures
 Steffan = "Steffan Christ S\u00c3\u00b8lvsten"
 Lasse = "Lasse Letager Hansen"
 Casper = "Casper Rysgaard"
 Louise = "Louise Dohn"
 Andreas = "Andreas Hesselholt H\u00c3\u00b8j Hansen"
 
-coffee_pings = [
-    message
-    for message in data["messages"]
-    if "content" in message and message["content"] in [coffee_emoji, coffee_emoji_no_tail]
-]
-
-cuts = [datetime.datetime(year, 9, 19, 0, 0, 0, tzinfo=zoneinfo.ZoneInfo("Europe/Copenhagen")) for year in [2022, 2023, 2024] ]
-
-coffee_pings_1 = [message for message in coffee_pings if cuts[0] <= to_datetime(message["timestamp_ms"]) < cuts[1]]
-coffee_pings_2 = [message for message in coffee_pings if cuts[1] <= to_datetime(message["timestamp_ms"]) < cuts[2]]
-
-coffee_pings_1_missing = [message for message in coffee_pings if message["content"] == coffee_emoji_no_tail and cuts[0] <= to_datetime(message["timestamp_ms"]) < cuts[1]]
-# print(len(coffee_pings_1_missing))
-# print(len(coffee_pings_1) - len(coffee_pings_1_missing))
-
-coffee_pings_1_steffan_missing = [
-    message
-    for message in coffee_pings
-    if message["content"] == coffee_emoji_no_tail and
-       message["sender_name"] == Steffan and
-       cuts[0] <= to_datetime(message["timestamp_ms"]) < cuts[1]
-]
-coffee_pings_1_steffan_not_missing = [
-    message
-    for message in coffee_pings
-    if message["content"] == coffee_emoji and
-       message["sender_name"] == Steffan and
-       cuts[0] <= to_datetime(message["timestamp_ms"]) < cuts[1]
-]
-steffan_pings = [message for message in coffee_pings if message["sender_name"] == Steffan]
-lasse_pings = [message for message in coffee_pings if message["sender_name"] == Lasse]
-casper_pings = [message for message in coffee_pings if message["sender_name"] == Casper]
-louise_pings = [message for message in coffee_pings if message["sender_name"] == Louise]
-andreas_pings = [message for message in coffee_pings if message["sender_name"] == Andreas]
-
-to_unix_times = lambda pings: [
-    message["timestamp_ms"]
-    for message in pings
-]
-
-unix_times = to_unix_times(coffee_pings)
-unix_times_1 = to_unix_times(coffee_pings_1)
-unix_times_2 = to_unix_times(coffee_pings_2)
-
-unix_time_with_sender = [(message["timestamp_ms"], message["sender_name"]) for message in coffee_pings]
-
-to_dates = lambda times: [
-    to_datetime(unix)
-    for unix in times
-]
-
-dates = to_dates(unix_times)
-dates_1 = to_dates(unix_times_1)
-dates_2 = to_dates(unix_times_2)
-dates_1_missing = to_dates(to_unix_times(coffee_pings_1_missing))
-dates_1_steffan_missing = to_dates(to_unix_times(coffee_pings_1_steffan_missing))
-dates_1_steffan_not_missing = to_dates(to_unix_times(coffee_pings_1_steffan_not_missing))
-dates_steffan = to_dates(to_unix_times(steffan_pings))
-dates_lasse = to_dates(to_unix_times(lasse_pings))
-dates_casper = to_dates(to_unix_times(casper_pings))
-dates_louise = to_dates(to_unix_times(louise_pings))
-dates_andreas = to_dates(to_unix_times(andreas_pings))
-
-print(min(dates))
-print(max(dates))
-
-print("Total pings:", len(coffee_pings))
-print("Year 1 pings:", len(coffee_pings_1))
-print("Year 2 pings:", len(coffee_pings_2))
-
-# w = sum(date.weekday() >= 5 or date.hour < 7 or date.hour >= 17 for date in dates)
-# print("Total outside work hours", w, w / len(dates))
-# persons = {message["sender_name"] for message in coffee_pings}
-# data = []
-# for person in persons:
-#     d = to_dates(to_unix_times(message for message in coffee_pings if message["sender_name"] == person))
-#     a = sum(date.weekday() >= 5 or date.hour < 7 or date.hour >= 17 for date in d)
-#     data.append((person, len(d), a, a / len(d)))
-# data = sorted(data, key=lambda t: t[-1])
-# print(*data, sep="\n")
-
-# plt.plot([0, len(data) - 1], [w/len(dates)]*2, ":", color="blue")
-# plt.plot([0, len(data) - 1], [data[len(data) // 2][-1]]*2, ":", color="red")
-# plt.plot(range(len(data)), [d[-1] for d in data], "-", color="black")
-# plt.xticks(range(len(data)), [d[0] for d in data], rotation=90, ha="right", va="center", rotation_mode="anchor")
-# plt.tight_layout()
-# plt.show()
-
-
-# from collections import Counter
-# print("Missing:", Counter(message["sender_name"] for message in coffee_pings_1_missing))
-
-plot_weekday_analysis(dates)
-# plot_weekday_analysis(dates_1)
-# plot_weekday_analysis(dates_2)
-# plot_weekday_analysis(dates_2, diff=dates_1)
-
-# plot_weeknumber_over_year_analysis(dates)
-# plot_weeknumber_over_year_analysis(dates_2, diff=dates_1)
-
-plot_year_analysis(dates, day_count_tests=[lambda c: c == 0])
-
-# days_in_month = [31, 29, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31]
-# all_dates = [
-#     (year, month, day)
-#     for year in [2022, 2023, 2024]
-#     for month, count in enumerate(days_in_month, start=1)
-#     for day in range(1, count + 1 - int(year != 2024 and month == 2))
-# ]
-# observe_dates = all_dates[261:-104]
-# buckets = {}
-# for y, m, d in observe_dates:
-#     if (m, d) not in buckets:
-#         buckets[m, d] = []
-#     buckets[m, d].append(y)
-# for (m, d), ys in buckets.items():
-#     if len(ys) == 1:
-#         assert (m, d) == (1, 29)
-#         continue
-#     y1, y2 = ys
-#     d1 = datetime.datetime(y1, m, d)
-#     d2 = datetime.datetime(y2, m, d)
-#     if d1.weekday() >= 5 and d2.weekday() >= 5:
-#         print(m, d, y1, y2, d1.weekday(), d2.weekday())
-
-# plot_year_analysis(dates_1, day_count_tests=[lambda c: c >= 20])
-# plot_year_analysis(dates_2, day_count_tests=[lambda c: c >= 20])
-# plot_year_analysis(dates_2, diff=dates_1)
-
-# plot_year_analysis(dates_1_missing, named="2022-2023_missing")
-# plot_year_analysis(dates_1_steffan_missing, named="2022-2023_steffan_missing")
-# plot_year_analysis(dates_1_steffan_not_missing, named="2022-2023_steffan_not_missing")
-# plot_year_analysis(dates_1_steffan_not_missing, diff=dates_1_steffan_missing, named="2022-2023_steffan_diff")
-
-# plot_year_analysis(dates_lasse)
-
-plot_weekday_and_month_side_by_side(dates_1, dates_2)
-# plot_weekday_hour_on_top(dates_1, dates_2)
-plot_weekday_hour_super_imposed(dates_1, dates_2)
-
-plot_count_days_with_certain_pings(dates)
-
-# plot_cummulative_year_analysis(dates)
-# plot_cummulative_year_analysis(dates_steffan, named="Steffan")
-plot_double_cummulative_year_analysis(dates, dates_steffan, "Steffan")
-# steffan_count = len(dates_steffan)
-# year_dates = 365 + 366
-# was_gone = 17 + 30 + 31 + 30 + 31 + 1
-# pings_pr_present_day = steffan_count / (year_dates - was_gone)
-# missing_pings = pings_pr_present_day * was_gone
-# print(steffan_count, pings_pr_present_day, was_gone, missing_pings)
-# plot_cummulative_year_analysis(dates_lasse, named=Lasse)
-# plot_cummulative_year_analysis(dates_casper, named=Casper)
-# plot_cummulative_year_analysis(dates_louise, named=Louise)
-# plot_cummulative_year_analysis(dates_andreas, named=Andreas)
-
-# plot_group_graf_relation(unix_time_with_sender, anonymous=False)
-plot_group_graf_relation(unix_time_with_sender, anonymous=True)
-
-# plot_group_sizes()
-# plot_people_count()
-# plot_people_count_time_sensitive()
+
+def article_figures(pings):
+    # The figures of the article, rendered all at once below or one at a time with `python cli.py plot <name>`.
+    # An export spanning fewer than two of the article's years, like a few months for trying a plot, has no first and
+    # second year, so the figures comparing them, drawn from pings_1 and pings_2, are left out.
+    cuts_ms = year_cuts_ms(pings.local)
+    # The same views the main script split, the periods are memoized per cuts
+    periods = pings.periods(cuts_ms)
+    # Every day from the first cut up to the last, or every day with pings when there is no whole period
+    observed = Calendar.between(cuts_ms[0], cuts_ms[-1]) if periods else None
+    pings_1, pings_2 = periods[:2] if len(periods) >= 2 else (None, None)
+
+    # Counted before the figures are forked out to the render workers, which then share them.
+    # The periods already got theirs when they were split.
+    pings.histograms()
+
+    figures = []
+    figures.append(Figure(plot_weekday_analysis, pings))
+    # figures.append(Figure(plot_weekday_analysis, pings_1))
+    # figures.append(Figure(plot_weekday_analysis, pings_2))
+    # figures.append(Figure(plot_weekday_analysis, pings_2, diff=pings_1))
+
+    # figures.append(Figure(plot_weeknumber_over_year_analysis, pings))
+    # figures.append(Figure(plot_weeknumber_over_year_analysis, pings_2, diff=pings_1))
+
+    figures.append(Figure(plot_year_analysis, pings, day_count_tests=[lambda c: c == 0]))
+
+    # days_in_month = [31, 29, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31]
+    # all_dates = [
+    #     (year, month, day)
+    #     for year in [2022, 2023, 2024]
+    #     for month, count in enumerate(days_in_month, start=1)
+    #     for day in range(1, count + 1 - int(year != 2024 and month == 2))
+    # ]
+    # observe_dates = all_dates[261:-104]
+    # buckets = {}
+    # for y, m, d in observe_dates:
+    #     if (m, d) not in buckets:
+    #         buckets[m, d] = []
+    #     buckets[m, d].append(y)
+    # for (m, d), ys in buckets.items():
+    #     if len(ys) == 1:
+    #         assert (m, d) == (1, 29)
+    #         continue
+    #     y1, y2 = ys
+    #     d1 = datetime.datetime(y1, m, d)
+    #     d2 = datetime.datetime(y2, m, d)
+    #     if d1.weekday() >= 5 and d2.weekday() >= 5:
+    #         print(m, d, y1, y2, d1.weekday(), d2.weekday())
+
+    # figures.append(Figure(plot_year_analysis, pings_1, day_count_tests=[lambda c: c >= 20]))
+    # figures.append(Figure(plot_year_analysis, pings_2, day_count_tests=[lambda c: c >= 20]))
+    # figures.append(Figure(plot_year_analysis, pings_2, diff=pings_1))
+
+    # Selected within the first year's index range, when they are drawn
+    # from ingest import coffee_emoji_no_tail
+    # from query import Between, Sender, Variant
+    # period_1 = Between(cuts_ms[0], cuts_ms[1])
+    # missing = Variant(coffee_emoji_no_tail)
+    # steffan = Sender(Steffan)
+    # pings_1_missing = pings.select(period_1 & missing)
+    # print(len(pings_1_missing))
+    # print(len(pings_1) - len(pings_1_missing))
+    # pings_1_steffan_missing = pings.select(period_1 & steffan & missing)
+    # pings_1_steffan_not_missing = pings.select(period_1 & steffan & ~missing)
+    # figures.append(Figure(plot_year_analysis, pings_1_missing, named="2022-2023_missing"))
+    # figures.append(Figure(plot_year_analysis, pings_1_steffan_missing, named="2022-2023_steffan_missing"))
+    # figures.append(Figure(plot_year_analysis, pings_1_steffan_not_missing, named="2022-2023_steffan_not_missing"))
+    # figures.append(Figure(plot_year_analysis, pings_1_steffan_not_missing, diff=pings_1_steffan_missing, named="2022-2023_steffan_diff"))
+
+    # figures.append(Figure(plot_year_analysis, pings.of_sender(Lasse)))
+
+    if pings_2 is not None:
+        figures.append(Figure(plot_weekday_and_month_side_by_side, pings_1, pings_2))
+        # figures.append(Figure(plot_weekday_hour_on_top, pings_1, pings_2))
+        figures.append(Figure(plot_weekday_hour_super_imposed, pings_1, pings_2))
+
+    figures.append(Figure(plot_count_days_with_certain_pings, pings, calendar=observed))
+
+    # figures.append(Figure(plot_cummulative_year_analysis, pings, calendar=observed))
+    # pings_steffan = pings.of_sender(Steffan)
+    # figures.append(Figure(plot_cummulative_year_analysis, pings_steffan, named="Steffan", calendar=observed))
+    figures.append(Figure(plot_double_cummulative_year_analysis, pings, Steffan, "Steffan", calendar=observed))
+    # steffan_count = len(pings_steffan)
+    # year_dates = 365 + 366
+    # was_gone = 17 + 30 + 31 + 30 + 31 + 1
+    # pings_pr_present_day = steffan_count / (year_dates - was_gone)
+    # missing_pings = pings_pr_present_day * was_gone
+    # print(steffan_count, pings_pr_present_day, was_gone, missing_pings)
+    # figures.append(Figure(plot_cummulative_year_analysis, pings.of_sender(Lasse), named=Lasse, calendar=observed))
+    # figures.append(Figure(plot_cummulative_year_analysis, pings.of_sender(Casper), named=Casper, calendar=observed))
+    # figures.append(Figure(plot_cummulative_year_analysis, pings.of_sender(Louise), named=Louise, calendar=observed))
+    # figures.append(Figure(plot_cummulative_year_analysis, pings.of_sender(Andreas), named=Andreas, calendar=observed))
+
+    # figures.append(Figure(plot_group_graf_relation, pings, anonymous=False))
+    figures.append(Figure(plot_group_graf_relation, pings, anonymous=True))
+
+    # figures.append(Figure(plot_group_sizes, pings))
+    # figures.append(Figure(plot_group_size_sweep, pings))
+    # figures.append(Figure(plot_people_count, pings))
+    # figures.append(Figure(plot_people_count_time_sensitive, pings, calendar=observed))
+    return figures
+
+
+if __name__ == "__main__":
+    assert next(iter_messages(export_files()[0]))["content"] == coffee_emoji
+
+    if PROFILE:
+        instrument.enable()
+
+    # Streamed from every message_N.json into columns, so the export is never held in memory as dicts.
+    # The columns are cached in .ping_cache until the export changes.
+    pings = load_pings(append=APPEND)
+    assert not (pings.variant == variant_code[coffee_emoji_steffan]).any()
+
+    # A year runs from September 19th, with a cut in every year the pings span
+    cuts_ms = year_cuts_ms(pings.local)
+    periods = pings.periods(cuts_ms)
+
+    print(to_datetime(pings.timestamp_ms[0]))
+    print(to_datetime(pings.timestamp_ms[-1]))
+
+    print("Total pings:", len(pings))
+    for i, period in enumerate(periods, start=1):
+        print(f"Year {i} pings:", len(period))
+
+    # outside = (pings.local.weekday >= 5) | (pings.local.hour < 7) | (pings.local.hour >= 17)
+    # w = int(outside.sum())
+    # print("Total outside work hours", w, w / len(pings))
+    # data = []
+    # for i, person in enumerate(pings.senders):
+    #     d = int((pings.sender == i).sum())
+    #     a = int((outside & (pings.sender == i)).sum())
+    #     data.append((person, d, a, a / d))
+    # data = sorted(data, key=lambda t: t[-1])
+    # print(*data, sep="\n")
+
+    # plt.plot([0, len(data) - 1], [w/len(pings)]*2, ":", color="blue")
+    # plt.plot([0, len(data) - 1], [data[len(data) // 2][-1]]*2, ":", color="red")
+    # plt.plot(range(len(data)), [d[-1] for d in data], "-", color="black")
+    # plt.xticks(range(len(data)), [d[0] for d in data], rotation=90, ha="right", va="center", rotation_mode="anchor")
+    # plt.tight_layout()
+    # plt.show()
+
+
+    # from collections import Counter
+    # from ingest import coffee_emoji_no_tail
+    # from query import Between, Variant
+    # print("Missing:", Counter(pings.select(Between(cuts_ms[0], cuts_ms[1]) & Variant(coffee_emoji_no_tail)).sender_names()))
+
+    # # Pings per day of every person in every year, all from one senders x days matrix
+    # from localtime import LocalTime
+    # # Every day from the first cut up to the last
+    # observed = Calendar.between(cuts_ms[0], cuts_ms[-1])
+    # day_bounds = observed.position(LocalTime.from_timestamps(cuts_ms).day)
+    # per_year = Distribution.of_day_counts(pings.sender_day_counts(observed), day_bounds)
+    # for person, median, mean, sd in zip(pings.senders, per_year.median.tolist(), per_year.mean.tolist(), per_year.sd.tolist()):
+    #     print(person, median, mean, sd)
+
+    # # Which weekdays, months and hours of the week changed between the years more than chance would move them
+    # from resampling import compare_periods
+    # pings_1, pings_2 = periods[:2]
+    # for field, comparison in compare_periods(pings_1, pings_2, seed=0).items():
+    #     print(field, np.round(comparison.difference, 3), np.round(comparison.p_value, 3), sep="\n")
+
+    figures = article_figures(pings)
+    # Figures whose plot function, data and styling are unchanged since the last run are not rendered again
+    with instrument.stage("render") as s:
+        render(figures, RENDER_WORKERS, cache=".figure_cache.json" if PLOT_SAVE else None)
+        s.items = len(figures)
+
+    if PROFILE:
+        instrument.report()
+        instrument.summary()
@@ -0,0 +1,183 @@
+import os
+import sys
+import json
+import time
+import argparse
+import contextlib
+import resource
+import datetime
+import platform
+import subprocess
+import tracemalloc
+
+import numpy as np
+
+from synthetic import write_export
+from pings import PingTable
+from localtime import LocalTime
+from histograms import Histograms
+from groups import find_groups
+
+
+exports_name = ".benchmark"
+results_name = "benchmark_results.jsonl"
+
+
+def ingest(state):
+    state["pings"] = PingTable.from_export(state["directory"])
+
+def timezone_conversion(state):
+    pings = state["pings"]
+    local = LocalTime.from_timestamps(pings.timestamp_ms)
+    state["pings"] = PingTable(pings.timestamp_ms, pings.sender, pings.variant, pings.senders, local)
+
+def histograms(state):
+    Histograms.of(state["pings"])
+
+def grouping(state):
+    state["groups"] = find_groups(state["pings"].timestamp_ms)
+
+def pair_weights(state):
+    # The co-occurrence plot_group_graf_relation draws its edges from
+    pings, groups = state["pings"], state["groups"]
+    incidence = groups.incidence(pings.sender, len(pings.senders))[groups.size >= 2]
+    (incidence.T @ incidence).tocsr()
+
+def rendering(state):
+    # A frequency figure and the relation graph drawn like the article figures, but written as .png with Agg,
+    # since the article's .pgf needs xelatex, which the machine running the benchmark need not have
+    import matplotlib
+    matplotlib.use("Agg")
+    import analyse
+    import render
+    render.plot_format = "png"
+    output = os.path.join(state["directory"], "plots")
+    os.makedirs(output, exist_ok=True)
+    cwd = os.getcwd()
+    os.chdir(output)
+    try:
+        figures = [render.Figure(analyse.plot_weekday_analysis, state["pings"]), render.Figure(analyse.plot_group_graf_relation, state["pings"])]
+        # What the plots print would end up among the results on stdout
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            render.render(figures, workers=0)
+    finally:
+        os.chdir(cwd)
+
+stages = {
+    "ingest": ingest,
+    "timezone": timezone_conversion,
+    "histograms": histograms,
+    "groups": grouping,
+    "pair_weights": pair_weights,
+    "render": rendering,
+}
+
+
+def export_directory(size, senders, seed):
+    # Generated exports are kept, since writing 10^8 messages takes longer than reading them
+    directory = os.path.join(exports_name, f"{size}_{senders}_{seed}")
+    if not os.path.isdir(directory):
+        write_export(directory + ".partial", size, senders, seed=seed)
+        os.replace(directory + ".partial", directory)
+    return directory
+
+
+def run_size(size, senders, seed, names, trace_memory):
+    # Every stage of one export size in this process, yielding the result of every stage as soon as it finishes,
+    # so the stages before one that fails are still reported.
+    # max_rss is the peak resident memory of the process so far, so it only grows from stage to stage.
+    # With trace_memory the peak of every stage alone is measured too, at the cost of slower timings.
+    state = {"directory": export_directory(size, senders, seed)}
+    if trace_memory:
+        tracemalloc.start()
+    for name in names:
+        if trace_memory:
+            tracemalloc.reset_peak()
+        start = time.perf_counter()
+        stages[name](state)
+        seconds = time.perf_counter() - start
+        result = {"size": size, "stage": name, "seconds": seconds, "max_rss": _max_rss()}
+        if trace_memory:
+            result["traced_peak"] = tracemalloc.get_traced_memory()[1]
+        yield result
+
+
+def _max_rss():
+    # Bytes, Linux reports kilobytes and macOS bytes
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return max_rss if sys.platform == "darwin" else max_rss * 1024
+
+
+def _version():
+    # The commit of the code being measured, wherever the benchmark is run from
+    repository = os.path.dirname(os.path.abspath(__file__))
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=repository, capture_output=True, text=True, check=True)
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=repository, capture_output=True, text=True)
+        return commit.stdout.strip() + ("-dirty" if dirty.stdout.strip() else "")
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _previous(results_path, version, trace_memory):
+    # The latest result of every (size, stage) from another version measured the same way, to compare against
+    previous = {}
+    if os.path.exists(results_path):
+        with open(results_path) as f:
+            for line in f:
+                result = json.loads(line)
+                if result.get("version") != version and result.get("trace_memory") == trace_memory:
+                    previous[result["size"], result["stage"]] = result
+    return previous
+
+
+def main(arguments=None):
+    parser = argparse.ArgumentParser(description="Time the pipeline stages on synthetic exports of growing size")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[3, 4, 5, 6], help="powers of ten of messages, up to 8")
+    parser.add_argument("--senders", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--stages", nargs="+", default=list(stages), choices=list(stages))
+    parser.add_argument("--trace-memory", action="store_true", help="also measure the peak of every stage alone")
+    parser.add_argument("--results", default=results_name)
+    parser.add_argument("--one", type=int, help=argparse.SUPPRESS)
+    arguments = parser.parse_args(arguments)
+
+    if arguments.one is not None:
+        for result in run_size(arguments.one, arguments.senders, arguments.seed, arguments.stages, arguments.trace_memory):
+            print(json.dumps(result), flush=True)
+        return
+
+    version = _version()
+    previous = _previous(arguments.results, version, arguments.trace_memory)
+    common = {
+        "version": version,
+        "time": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "senders": arguments.senders,
+        "trace_memory": arguments.trace_memory,
+    }
+    print(f"{'messages':>10} {'stage':<13} {'seconds':>9} {'max rss':>9} {'vs last':>8}" + f" {'stage peak':>10}" * arguments.trace_memory)
+    for power in arguments.sizes:
+        # Every size in a fresh process, so the memory peaks of one size do not carry over to the next
+        command = [sys.executable, os.path.abspath(__file__), "--one", str(10 ** power), "--senders", str(arguments.senders),
+                   "--seed", str(arguments.seed), "--stages", *arguments.stages] + ["--trace-memory"] * arguments.trace_memory
+        # Read as the child prints them, so every stage is shown and written when it finishes
+        with subprocess.Popen(command, stdout=subprocess.PIPE, text=True) as child:
+            for line in child.stdout:
+                result = {**common, **json.loads(line)}
+                last = previous.get((result["size"], result["stage"]))
+                change = f"x{result['seconds'] / last['seconds']:.2f}" if last and last["seconds"] > 0 else ""
+                line = f"{result['size']:>10} {result['stage']:<13} {result['seconds']:>9.3f} {result['max_rss'] / 2**20:>7.0f}MB {change:>8}"
+                if "traced_peak" in result:
+                    line += f" {result['traced_peak'] / 2**20:>8.1f}MB"
+                print(line)
+                with open(arguments.results, "a") as f:
+                    f.write(json.dumps(result) + "\n")
+        if child.returncode != 0:
+            print(f"Stopped at 10^{power} messages, the run failed with exit code {child.returncode}")
+            break
+
+
+if __name__ == "__main__":
+    main()
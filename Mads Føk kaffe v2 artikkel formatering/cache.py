@@ -0,0 +1,125 @@
+import os
+import json
+import shutil
+import hashlib
+
+import numpy as np
+
+from ingest import export_files, newer_pings
+from pings import PingTable
+from instrument import stage
+
+
+cache_name = ".ping_cache"
+columns = ["timestamp_ms", "sender", "variant"]
+
+
+def export_hash(files):
+    digest = hashlib.sha256()
+    for path in files:
+        digest.update(os.path.basename(path).encode())
+        with open(path, "rb") as f:
+            while chunk := f.read(1 << 20):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+
+def export_stamp(files):
+    return json.dumps([(os.path.basename(path), os.stat(path).st_size, os.stat(path).st_mtime_ns) for path in files])
+
+
+def read_stamps(cache):
+    try:
+        with open(os.path.join(cache, "stamps.json")) as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def write_stamps(cache, stamps):
+    os.makedirs(cache, exist_ok=True)
+    with open(os.path.join(cache, "stamps.json"), "w") as f:
+        json.dump(stamps, f)
+
+
+def export_key(files, cache):
+    # Hashing a multi gigabyte export is slow, so remember the hash for files whose size and mtime are unchanged
+    stamp = export_stamp(files)
+    stamps = read_stamps(cache)
+    if stamp not in stamps:
+        stamps = {stamp: export_hash(files)}
+        write_stamps(cache, stamps)
+    return stamps[stamp]
+
+
+def append_key(key, pings):
+    # Key of the cached table `key` with its newest millisecond replaced by `pings`, from the new pings alone instead
+    # of the whole export
+    digest = hashlib.sha256(key.encode())
+    for column in columns:
+        digest.update(np.ascontiguousarray(getattr(pings, column)).data)
+    digest.update(json.dumps(pings.senders).encode())
+    return digest.hexdigest()
+
+
+def read_table(path):
+    arrays = [np.load(os.path.join(path, f"{column}.npy"), mmap_mode="r") for column in columns]
+    with open(os.path.join(path, "senders.json")) as f:
+        senders = json.load(f)
+    return PingTable(*arrays, senders)
+
+
+def write_table(path, pings):
+    partial = path + ".partial"
+    shutil.rmtree(partial, ignore_errors=True)
+    os.makedirs(partial)
+    for column in columns:
+        np.save(os.path.join(partial, f"{column}.npy"), getattr(pings, column))
+    with open(os.path.join(partial, "senders.json"), "w") as f:
+        json.dump(pings.senders, f)
+    os.replace(partial, path)
+
+
+def load_pings(directory=".", append=False):
+    files = export_files(directory)
+    cache = os.path.join(directory, cache_name)
+    entries = [os.path.join(cache, entry) for entry in os.listdir(cache)] if os.path.isdir(cache) else []
+    entries = [entry for entry in entries if os.path.isdir(entry)]
+    previous = [entry for entry in entries if not entry.endswith(".partial")]
+    stamp = export_stamp(files)
+
+    if append and previous and stamp not in read_stamps(cache):
+        # A re-export of the same chat only adds messages, so only the pings after the cached ones are parsed and
+        # the export is never hashed. The stamp of the re-export is remembered with the new key, so later runs of
+        # either kind hit the extended table.
+        with stage("parse new pings") as s:
+            pings = read_table(previous[0])
+            watermark = int(pings.timestamp_ms[-1]) if len(pings) else -1
+            new_pings = PingTable.from_pings(newer_pings(directory, watermark))
+            s.items = len(new_pings)
+        # The pings of the watermark's millisecond were parsed again with the new ones, so they replace the cached ones
+        kept = int(np.searchsorted(pings.timestamp_ms, watermark))
+        key = os.path.basename(previous[0])
+        if len(new_pings) > len(pings) - kept:
+            key = append_key(key, new_pings)
+            pings = pings[:kept].concatenate(new_pings)
+        write_stamps(cache, {stamp: key})
+    else:
+        key = export_key(files, cache)
+        if os.path.isdir(os.path.join(cache, key)):
+            with stage("read cache") as s:
+                pings = read_table(os.path.join(cache, key))
+                s.items = len(pings)
+            return pings
+        with stage("parse export") as s:
+            pings = PingTable.from_export(directory)
+            s.items = len(pings)
+
+    path = os.path.join(cache, key)
+    if not os.path.isdir(path):
+        # Entries for older exports can never be hit again
+        for entry in entries:
+            shutil.rmtree(entry)
+        with stage("write cache"):
+            write_table(path, pings)
+    return pings
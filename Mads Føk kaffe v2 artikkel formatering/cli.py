@@ -0,0 +1,195 @@
+import sys
+import argparse
+
+
+# Every command imports what it needs when it runs, so only `plot` loads matplotlib and only `relations` and the
+# relation figures load scipy. After the first run the pings are read from the columns in .ping_cache.
+
+
+def _pings(arguments):
+    from cache import load_pings
+    pings = load_pings(arguments.directory, append=arguments.append)
+    query = _query(arguments)
+    return pings if query is None else pings.select(query)
+
+
+def _query(arguments):
+    # The pings every command is limited to by --sender, --since and --until. One sender, also within dates, is a
+    # view into the sender index rather than a copy.
+    from query import Between, Sender
+    query = None
+    if arguments.sender:
+        query = Sender(*arguments.sender)
+    if arguments.since or arguments.until:
+        between = Between(_day_ms(arguments.since), _day_ms(arguments.until))
+        query = between if query is None else query & between
+    return query
+
+
+def _day_ms(date):
+    # Local midnight starting a YYYY-MM-DD date
+    import datetime
+    from localtime import timezone
+    return None if date is None else int(datetime.datetime.fromisoformat(date).replace(tzinfo=timezone).timestamp()) * 1000
+
+
+def _date(unix_ms):
+    import datetime
+    from localtime import timezone
+    return f"{datetime.datetime.fromtimestamp(unix_ms // 1000, tz=timezone):%Y-%m-%d %H:%M}"
+
+
+def ingest(arguments):
+    # Parses the export into the cache, or checks that the cache is up to date
+    pings = _pings(arguments)
+    print("Pings:", len(pings))
+    print("Senders:", len(pings.present_senders()))
+    if len(pings):
+        print("From", _date(int(pings.timestamp_ms[0])), "to", _date(int(pings.timestamp_ms[-1])))
+
+
+def stats(arguments):
+    # Pings and pings per day, in all and in every year of the article
+    from localtime import LocalTime, Calendar, year_cuts_ms
+    from distribution import Distribution
+
+    pings = _pings(arguments)
+    if not len(pings):
+        print("No pings")
+        return
+    calendar = Calendar.of(pings.local)
+    cuts_ms = year_cuts_ms(pings.local)
+    periods = pings.periods(cuts_ms)
+
+    # Rows of (label, pings, distribution of pings per day, index of the row in the distribution)
+    rows = [("All", len(pings), Distribution.of_day_counts(calendar.counts(pings.local.day)[None]), (0, 0))]
+    if periods:
+        observed = Calendar.between(cuts_ms[0], cuts_ms[-1])
+        day_bounds = observed.position(LocalTime.from_timestamps(cuts_ms).day)
+        per_year = Distribution.of_day_counts(observed.counts(pings.local.day)[None], day_bounds)
+        for i, period in enumerate(periods):
+            rows.append((f"Year {i + 1} from {_date(cuts_ms[i])[:10]}", len(period), per_year, (0, i)))
+
+    if arguments.senders:
+        # Every present sender over the days from their first ping to their last, most pings first
+        day_counts = pings.sender_day_counts(calendar)
+        totals = day_counts.sum(axis=1).tolist()
+        for s in sorted(pings.present_senders().tolist(), key=lambda s: -totals[s]):
+            active = day_counts[s].nonzero()[0]
+            distribution = Distribution.of_day_counts(day_counts[s:s + 1, active[0]:active[-1] + 1])
+            rows.append((pings.senders[s], totals[s], distribution, (0, 0)))
+
+    print("From", _date(int(pings.timestamp_ms[0])), "to", _date(int(pings.timestamp_ms[-1])))
+    print(f"{'':<32} {'pings':>7} {'days':>5} {'per day':>8} {'median':>7} {'sd':>6}")
+    for label, count, distribution, at in rows:
+        print(f"{label[:32]:<32} {count:>7} {int(distribution.total[at]):>5} {float(distribution.mean[at]):>8.2f} "
+              f"{int(distribution.median[at]):>7} {float(distribution.sd[at]):>6.2f}")
+
+
+def grouping(arguments):
+    # Trips of pings at most --minutes apart, by size
+    from groups import suggest_threshold
+
+    pings = _pings(arguments)
+    found = pings.groups(round(arguments.minutes * 60 * 1000))
+    is_group = found.size >= 2
+    print(f"Groups within {arguments.minutes:g} minutes:", len(found.size))
+    print("Solo:", int((~is_group).sum()))
+    print("With a sender pinging twice:", int((is_group & (found.distinct(pings.sender) < found.size)).sum()))
+    print(f"{'size':>5} {'groups':>7}")
+    for size, count in enumerate(found.size_count.tolist()):
+        if count:
+            print(f"{size:>5} {count:>7}")
+    print(f"Suggested window: {suggest_threshold(pings.timestamp_ms) / 60000:.1f} minutes")
+
+
+def relations(arguments):
+    # The pairs of senders most often in a trip together, the edges of plot_group_graf_relation
+    import scipy.sparse
+
+    pings = _pings(arguments)
+    found = pings.groups(round(arguments.minutes * 60 * 1000))
+    incidence = found.incidence(pings.sender, len(pings.senders))[found.size >= 2]
+    co_occurrence = (incidence.T @ incidence).tocsr()
+    group_count = co_occurrence.diagonal().tolist()
+    pairs = scipy.sparse.triu(co_occurrence, k=1).tocoo()
+    weights = sorted(zip(pairs.data.tolist(), pairs.row.tolist(), pairs.col.tolist()), key=lambda w: -w[0])
+
+    # The share is of the trips of whichever of the two went on fewer
+    print(f"{'trips':>6} {'share':>6}  pair")
+    for w, a, b in weights[:arguments.top]:
+        print(f"{w:>6} {w / min(group_count[a], group_count[b]):>6.0%}  {pings.senders[a]}, {pings.senders[b]}")
+
+
+def plot(arguments):
+    # One of the article's figures, written like analyse.py writes it. Plots outside the article are drawn from all
+    # the pings when that is all they take. Without a name, lists the plots.
+    import inspect
+    import analyse
+    from render import Figure, render
+
+    names = sorted(
+        name[len("plot_"):] for name, value in vars(analyse).items()
+        if name.startswith("plot_") and inspect.isfunction(value) and value.__module__ == analyse.__name__
+    )
+    if arguments.name is None:
+        print(*names, sep="\n")
+        return
+    name = arguments.name.removeprefix("plot_")
+    if name not in names:
+        sys.exit(f"No plot named {name}, see `python cli.py plot` for the names")
+
+    pings = _pings(arguments)
+    function = getattr(analyse, "plot_" + name)
+    figures = [figure for figure in analyse.article_figures(pings) if figure.plot is function]
+    if not figures:
+        required = [p for p in inspect.signature(function).parameters.values() if p.default is p.empty]
+        if len(required) != 1:
+            sys.exit(f"plot_{name} takes more than the pings and is not among the article's figures for this export")
+        figures = [Figure(function, pings)]
+    # The same figure cache as analyse.py, so a figure rendered by either is not rendered again by the other
+    render(figures, workers=0, cache=".figure_cache.json")
+
+
+def main(arguments=None):
+    parser = argparse.ArgumentParser(description="Coffee ping analysis of a Messenger export")
+    parser.add_argument("--directory", default=".", help="folder with the export's message_N.json files")
+    parser.add_argument("--append", action="store_true", help="only parse the pings newer than the cached ones")
+    parser.add_argument("--profile", action="store_true", help="time every stage, see instrument.py")
+    parser.add_argument("--sender", action="append", help="only the pings of this sender, can be given more than once")
+    parser.add_argument("--since", help="only the pings from this local date on, YYYY-MM-DD")
+    parser.add_argument("--until", help="only the pings before this local date, YYYY-MM-DD")
+    commands = parser.add_subparsers(required=True, metavar="command")
+
+    command = commands.add_parser("ingest", help="parse the export into the cache")
+    command.set_defaults(run=ingest)
+
+    command = commands.add_parser("stats", help="pings and pings per day, in all and per year")
+    command.add_argument("--senders", action="store_true", help="also every sender")
+    command.set_defaults(run=stats)
+
+    command = commands.add_parser("plot", help="render one figure, or list them")
+    command.add_argument("name", nargs="?")
+    command.set_defaults(run=plot)
+
+    command = commands.add_parser("groups", help="trips by size")
+    command.add_argument("--minutes", type=float, default=5)
+    command.set_defaults(run=grouping)
+
+    command = commands.add_parser("relations", help="the senders most often on a trip together")
+    command.add_argument("--minutes", type=float, default=5)
+    command.add_argument("--top", type=int, default=20)
+    command.set_defaults(run=relations)
+
+    arguments = parser.parse_args(arguments)
+    if arguments.profile:
+        import instrument
+        instrument.enable()
+    arguments.run(arguments)
+    if arguments.profile:
+        instrument.report()
+        instrument.summary()
+
+
+if __name__ == "__main__":
+    main()
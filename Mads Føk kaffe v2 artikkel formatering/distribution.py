@@ -0,0 +1,44 @@
+import numpy as np
+
+
+class Distribution:
+    # Statistics of whole numbers given as a histogram, counts[..., v] is how often the value v occurs.
+    # Leading axes are batched, e.g. senders x periods, and nothing grows with the number of observations:
+    #   total      number of observations
+    #   mean, variance, sd, skew   population moments, like the original full_data sums
+
+    def __init__(self, counts):
+        self.counts = np.asarray(counts, dtype=np.int64)
+        values = np.arange(self.counts.shape[-1])
+        with np.errstate(invalid="ignore", divide="ignore"):
+            self.total = self.counts.sum(axis=-1)
+            self.mean = self.counts @ values / self.total
+            centered = values - self.mean[..., None]
+            self.variance = (self.counts * centered ** 2).sum(axis=-1) / self.total
+            self.sd = np.sqrt(self.variance)
+            self.skew = (self.counts * centered ** 3).sum(axis=-1) / self.total / self.sd ** 3
+
+    @classmethod
+    def of_day_counts(cls, day_counts, bounds=None):
+        # Pings per day for every row of a rows x days matrix such as PingTable.sender_day_counts, separately for
+        # the days bounds[i]:bounds[i + 1] of every period. Gives rows x periods distributions from one bincount.
+        day_counts = np.asarray(day_counts)
+        rows, days = day_counts.shape
+        bounds = [0, days] if bounds is None else bounds
+        periods = len(bounds) - 1
+        width = int(day_counts.max()) + 1 if day_counts.size else 1
+
+        period = np.repeat(np.arange(periods), np.diff(bounds))
+        row = np.arange(rows)[:, None]
+        key = (row * periods + period) * width + day_counts[:, bounds[0]:bounds[-1]]
+        counts = np.bincount(key.ravel(), minlength=rows * periods * width)
+        return cls(counts.reshape(rows, periods, width))
+
+    def quantile(self, q):
+        # The value at position q * total of the sorted observations, the median is quantile(0.5)
+        position = np.minimum((q * self.total).astype(np.int64), self.total - 1)
+        return (np.cumsum(self.counts, axis=-1) <= position[..., None]).sum(axis=-1)
+
+    @property
+    def median(self):
+        return self.quantile(0.5)
@@ -0,0 +1,88 @@
+import numpy as np
+
+
+# Five minutes
+time_within = 5 * 60 * 1000
+
+
+class Groups:
+    # Sorted pings split wherever two neighbours are more than `time_within` apart:
+    #   label        group id of every ping
+    #   start, end   index range of every group in the sorted pings
+    #   size         pings in every group
+    #   size_count   number of groups of every size, size_count[0] is always 0
+
+    def __init__(self, label, start, end):
+        self.label = label
+        self.start = start
+        self.end = end
+        self.size = end - start
+        self.size_count = np.bincount(self.size, minlength=1) if len(self.size) else np.zeros(1, dtype=np.int64)
+
+    def distinct(self, values):
+        # Number of different values within every group, e.g. how many different senders
+        width = int(values.max()) + 1 if len(values) else 1
+        pairs = np.unique(self.label * width + values)
+        return np.bincount(pairs // width, minlength=len(self.size))
+
+    def incidence(self, values, width=None):
+        # Sparse groups x values matrix with a 1 where the value occurs in the group, however often it occurs.
+        # scipy takes longer to import than the rest of the pipeline, so only the callers of this import it.
+        import scipy.sparse
+        width = width if width is not None else int(values.max()) + 1 if len(values) else 1
+        pairs = np.unique(self.label * width + values)
+        ones = np.ones(len(pairs), dtype=np.int64)
+        return scipy.sparse.csr_matrix((ones, (pairs // width, pairs % width)), shape=(len(self.size), width))
+
+
+def find_groups(sorted_time, time_within=time_within):
+    sorted_time = np.asarray(sorted_time)
+    breaks = np.flatnonzero(np.diff(sorted_time) > time_within) + 1
+    label = np.zeros(len(sorted_time), dtype=np.int64)
+    label[breaks] = 1
+    np.cumsum(label, out=label)
+    start = np.concatenate([[0], breaks]) if len(sorted_time) else np.zeros(0, dtype=np.int64)
+    end = np.concatenate([breaks, [len(sorted_time)]]) if len(sorted_time) else np.zeros(0, dtype=np.int64)
+    return Groups(label, start, end)
+
+
+def group_size_sweep(sorted_time, thresholds):
+    # Group size counts for every window in `thresholds`, like find_groups(sorted_time, threshold).size_count.
+    # Every gap is ranked once by the smallest window it fits, so a window splits the pings at the gaps ranked above
+    # it, and each window is one comparison of the small ranks instead of a pass over the times.
+    n = len(sorted_time)
+    windows = sorted(set(thresholds))
+    gaps = np.diff(np.asarray(sorted_time))
+    rank = np.searchsorted(np.asarray(windows), gaps, side="left").astype(np.min_scalar_type(len(windows)))
+
+    size_counts = {}
+    for i, threshold in enumerate(windows):
+        if not n:
+            size_counts[threshold] = np.zeros(1, dtype=np.int64)
+            continue
+        breaks = np.flatnonzero(rank > i)
+        size = np.diff(np.concatenate([[-1], breaks, [n - 1]]))
+        size_counts[threshold] = np.bincount(size, minlength=1)
+    return size_counts
+
+
+def suggest_threshold(sorted_time, low=30 * 1000, high=30 * 60 * 1000, bins=200):
+    # On a log scale the gaps within groups and the gaps between groups form two humps.
+    # Split them where Otsu's method finds the least spread within each hump, looking between `low` and `high`.
+    gaps = np.diff(np.asarray(sorted_time))
+    log_gaps = np.log10(gaps[gaps > 0])
+    counts, edges = np.histogram(log_gaps, bins=bins)
+    centers = (edges[:-1] + edges[1:]) / 2
+
+    below = np.cumsum(counts)[:-1]
+    above = len(log_gaps) - below
+    sum_below = np.cumsum(counts * centers)[:-1]
+    mean_below = sum_below / np.maximum(below, 1)
+    mean_above = (np.sum(counts * centers) - sum_below) / np.maximum(above, 1)
+    between_variance = below * above * (mean_below - mean_above) ** 2
+
+    splits = edges[1:-1]
+    allowed = (np.log10(low) <= splits) & (splits <= np.log10(high))
+    if not allowed.any():
+        return time_within
+    return int(round(10 ** splits[allowed][np.argmax(between_variance[allowed])]))
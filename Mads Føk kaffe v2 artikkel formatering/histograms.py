@@ -0,0 +1,67 @@
+import numpy as np
+
+
+# Every date is laid out in a leap year, so February 29th always has its own bin
+days_in_month = [31, 29, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31]
+month_offsets = np.concatenate([[0], np.cumsum(days_in_month)[:-1]])
+
+shapes = {
+    "weekday": (7,),
+    "weekday_hour": (7, 24),
+    "month": (12,),
+    "month_day": (sum(days_in_month),),
+    "week": (54,),
+}
+
+
+class Histograms:
+    # Ping counts per calendar bin:
+    #   weekday        7 bins, Monday first
+    #   weekday_hour   7 x 24 bins
+    #   month          12 bins, January first
+    #   month_day      366 bins, the days of a leap year
+    #   week           54 bins indexed by ISO week number, bin 0 is always empty
+
+    def __init__(self, **counts):
+        for field in shapes:
+            setattr(self, field, counts[field])
+
+    @classmethod
+    def of(cls, pings):
+        return cls.of_periods(pings, [0, len(pings)])[0]
+
+    @classmethod
+    def of_periods(cls, pings, bounds):
+        # Histograms of the pings bounds[i]:bounds[i + 1] for every i, counted with one bincount per field
+        # by offsetting every period's bins past the bins of the period before it
+        if len(bounds) < 2:
+            return []
+        local = pings.local[bounds[0]:bounds[-1]]
+        periods = len(bounds) - 1
+        period = np.repeat(np.arange(periods), np.diff(bounds))
+        month = local.month.astype(np.intp) - 1
+        flat = {
+            "weekday": local.weekday,
+            "weekday_hour": local.weekday.astype(np.intp) * 24 + local.hour,
+            "month": month,
+            "month_day": month_offsets[month] + local.monthday - 1,
+            "week": local.week,
+        }
+        counts = {
+            field: np.bincount(period * np.prod(shape) + flat[field], minlength=periods * np.prod(shape))
+            for field, shape in shapes.items()
+        }
+        return [
+            cls(**{field: counts[field].reshape(periods, *shape)[i] for field, shape in shapes.items()})
+            for i in range(periods)
+        ]
+
+    def __add__(self, other):
+        return Histograms(**{field: getattr(self, field) + getattr(other, field) for field in shapes})
+
+    def __sub__(self, other):
+        return Histograms(**{field: getattr(self, field) - getattr(other, field) for field in shapes})
+
+    def month_days(self):
+        # month_day split back into one list of day counts per month
+        return [self.month_day[offset:offset + days].tolist() for offset, days in zip(month_offsets, days_in_month)]
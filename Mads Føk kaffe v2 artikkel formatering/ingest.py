@@ -0,0 +1,149 @@
+import os
+import re
+import json
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+
+
+coffee_emoji = "\u00e2\u0098\u0095\u00ef\u00b8\u008f"
+coffee_emoji_steffan = "\u00e2\u0098\u0095\u00ef\u00b8\u008e"
+coffee_emoji_no_tail = "\u00e2\u0098\u0095"
+
+coffee_variants = [coffee_emoji, coffee_emoji_steffan, coffee_emoji_no_tail]
+variant_code = {variant: code for code, variant in enumerate(coffee_variants)}
+
+ping_keys = ["content", "sender_name", "timestamp_ms"]
+
+
+_decoder = json.JSONDecoder()
+_whitespace = re.compile(r"\s*")
+_export_file = re.compile(r"message_(\d+)\.json")
+
+
+class _Buffer:
+    # Sliding window over the export, only ever holding one chunk plus the value being decoded
+
+    def __init__(self, f, chunk_size):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.text = ""
+        self.pos = 0
+        self.eof = False
+
+    def fill(self):
+        chunk = self.f.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            raise ValueError("Unexpected end of Messenger export")
+        self.text = self.text[self.pos:] + chunk
+        self.pos = 0
+
+    def peek(self):
+        while True:
+            self.pos = _whitespace.match(self.text, self.pos).end()
+            if self.pos < len(self.text):
+                return self.text[self.pos]
+            self.fill()
+
+    def take(self, char):
+        if self.peek() != char:
+            raise ValueError(f"Expected {char!r} in Messenger export, got {self.text[self.pos]!r}")
+        self.pos += 1
+
+    def skip(self, char):
+        if self.peek() == char:
+            self.pos += 1
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.text, self.pos)
+            except json.JSONDecodeError:
+                self.fill()
+                continue
+            # A number running into the end of the buffer may continue in the next chunk
+            if end == len(self.text) and not self.eof:
+                try:
+                    self.fill()
+                except ValueError:
+                    pass
+                else:
+                    continue
+            self.pos = end
+            return value
+
+
+def iter_messages(path, chunk_size=1 << 20):
+    with open(path, encoding="utf-8") as f:
+        buffer = _Buffer(f, chunk_size)
+        buffer.take("{")
+        while buffer.peek() != "}":
+            key = buffer.value()
+            buffer.take(":")
+            if key == "messages":
+                buffer.take("[")
+                while buffer.peek() != "]":
+                    yield buffer.value()
+                    buffer.skip(",")
+                buffer.take("]")
+            else:
+                buffer.value()
+            buffer.skip(",")
+
+
+def iter_coffee_pings(path, chunk_size=1 << 20):
+    for message in iter_messages(path, chunk_size):
+        if message.get("content") in coffee_variants:
+            yield {key: message[key] for key in ping_keys}
+
+
+def export_files(directory="."):
+    numbered = [
+        (int(match.group(1)), os.path.join(directory, file))
+        for file in os.listdir(directory)
+        if (match := _export_file.fullmatch(file))
+    ]
+    if not numbered:
+        raise FileNotFoundError(f"No message_N.json files in {directory!r}")
+    return [path for _, path in sorted(numbered)]
+
+
+def ping_columns(pings):
+    # A stream of pings as compact columns in stream order: timestamps, sender ids into the returned names in order
+    # of first appearance, and variant codes. About 11 bytes per ping, where a ping dict takes hundreds.
+    sender_ids = {}
+    timestamps = array("q")
+    senders = array("H")
+    variants = array("B")
+    for ping in pings:
+        timestamps.append(ping["timestamp_ms"])
+        senders.append(sender_ids.setdefault(ping["sender_name"], len(sender_ids)))
+        variants.append(variant_code[ping["content"]])
+    return timestamps, senders, variants, list(sender_ids)
+
+
+def _load_file(path):
+    return ping_columns(iter_coffee_pings(path))
+
+
+def load_export(directory=".", workers=None):
+    # The ping_columns of every message_N.json in the export's order, see PingTable.from_parts for joining them.
+    # Several files are parsed in parallel, every worker sending back its file's columns.
+    files = export_files(directory)
+    if len(files) == 1:
+        return [_load_file(files[0])]
+
+    with ProcessPoolExecutor(max_workers=min(workers or os.cpu_count(), len(files))) as pool:
+        return list(pool.map(_load_file, files))
+
+
+def newer_pings(directory, watermark):
+    # message_1.json holds the newest messages and every file is newest first, so stop at the first ping older than
+    # the watermark. Every ping in the watermark's millisecond is read again, since a new ping can share it with the
+    # newest cached one, and the caller replaces the cached pings of that millisecond with them.
+    for path in export_files(directory):
+        for ping in iter_coffee_pings(path):
+            if ping["timestamp_ms"] < watermark:
+                return
+            yield ping
@@ -0,0 +1,111 @@
+import json
+import time
+import tracemalloc
+
+
+report_name = "profile.json"
+
+enabled = False
+_records = []
+_open = []
+
+
+class Stage:
+    # One timed stretch of a run, used as `with stage("name") as s: ...; s.items = count`:
+    #   wall, cpu      seconds of wall clock and of this process' CPU
+    #   peak_memory    most traced memory in use during the stage above what was in use when it started
+    #   items          what the stage worked through, e.g. pings, when the stage sets it
+
+    def __init__(self, name):
+        self.name = name
+        self.items = None
+
+    def __enter__(self):
+        # Tracemalloc only keeps one peak, so the open stages take theirs before it is reset for this one
+        for outer in _open:
+            outer.peak = max(outer.peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.reset_peak()
+        self.depth = len(_open)
+        self.start_memory = tracemalloc.get_traced_memory()[0]
+        self.peak = self.start_memory
+        self.start_wall = time.perf_counter()
+        self.start_cpu = time.process_time()
+        _open.append(self)
+        return self
+
+    def __exit__(self, *exception):
+        wall = time.perf_counter() - self.start_wall
+        cpu = time.process_time() - self.start_cpu
+        self.peak = max(self.peak, tracemalloc.get_traced_memory()[1])
+        _open.pop()
+        if _open:
+            _open[-1].peak = max(_open[-1].peak, self.peak)
+        _records.append({
+            "name": self.name,
+            "depth": self.depth,
+            "wall": wall,
+            "cpu": cpu,
+            "peak_memory": self.peak - self.start_memory,
+            "items": self.items,
+        })
+
+
+class _Disabled:
+    # Stands in for every stage when instrumentation is off, so a disabled stage is one attribute lookup
+    items = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception):
+        pass
+
+    def __setattr__(self, name, value):
+        pass
+
+_disabled = _Disabled()
+
+
+def stage(name):
+    return Stage(name) if enabled else _disabled
+
+
+def enable():
+    global enabled
+    enabled = True
+    if not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+
+def take():
+    # The records so far, emptying the list, for forked workers to send theirs back
+    records = list(_records)
+    _records.clear()
+    return records
+
+
+def extend(records):
+    _records.extend(records)
+
+
+def report(path=report_name):
+    with open(path, "w") as f:
+        json.dump({"stages": _records}, f, indent=1)
+
+
+def summary(lines=20):
+    # One screen of the stages by total wall time, stages run more than once added up
+    totals = {}
+    for record in _records:
+        total = totals.setdefault(record["name"], {"count": 0, "wall": 0, "cpu": 0, "peak_memory": 0, "items": None})
+        total["count"] += 1
+        total["wall"] += record["wall"]
+        total["cpu"] += record["cpu"]
+        total["peak_memory"] = max(total["peak_memory"], record["peak_memory"])
+        if record["items"] is not None:
+            total["items"] = (total["items"] or 0) + record["items"]
+
+    print(f"{'stage':<45} {'runs':>5} {'wall s':>8} {'cpu s':>8} {'peak MB':>8} {'items':>10}")
+    for name, total in sorted(totals.items(), key=lambda item: -item[1]["wall"])[:lines]:
+        items = "" if total["items"] is None else total["items"]
+        print(f"{name[:45]:<45} {total['count']:>5} {total['wall']:>8.2f} {total['cpu']:>8.2f} {total['peak_memory'] / 2**20:>8.1f} {items:>10}")
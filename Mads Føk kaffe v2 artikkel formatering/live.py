@@ -0,0 +1,160 @@
+import sys
+import json
+import time
+import asyncio
+
+import numpy as np
+
+from ingest import coffee_variants
+from groups import time_within
+
+
+class ClosedGroup:
+    # A finished group of one chat, senders in ping order with repeats
+
+    def __init__(self, chat, start_ms, end_ms, senders):
+        self.chat = chat
+        self.start_ms = start_ms
+        self.end_ms = end_ms
+        self.senders = senders
+        self.size = len(senders)
+        self.members = sorted(set(senders))
+
+
+class AggregateState:
+    # The groups of one chat closed so far, counted by size like Groups.size_count
+
+    def __init__(self):
+        self.group_sizes = np.zeros(1, dtype=np.int64)
+
+    def close_group(self, senders):
+        if len(self.group_sizes) <= len(senders):
+            self.group_sizes = np.pad(self.group_sizes, (0, len(senders) + 1 - len(self.group_sizes)))
+        self.group_sizes[len(senders)] += 1
+
+
+class GroupDetector:
+    # The open group of one chat, fed one ping at a time in time order under the same rule as find_groups:
+    # a ping more than `time_within` after the previous one starts a new group and closes the old one
+
+    def __init__(self, chat, time_within=time_within):
+        self.chat = chat
+        self.time_within = time_within
+        self.start_ms = None
+        self.last_ms = None
+        self.senders = []
+
+    def add(self, timestamp_ms, sender):
+        closed = None
+        if self.last_ms is not None and timestamp_ms - self.last_ms > self.time_within:
+            closed = self.close()
+        if self.last_ms is None:
+            self.start_ms = timestamp_ms
+        self.last_ms = timestamp_ms
+        self.senders.append(sender)
+        return closed
+
+    def deadline_ms(self):
+        # After this no ping can join the open group any more
+        return None if self.last_ms is None else self.last_ms + self.time_within
+
+    def close(self):
+        closed = ClosedGroup(self.chat, self.start_ms, self.last_ms, self.senders)
+        self.start_ms, self.last_ms, self.senders = None, None, []
+        return closed
+
+
+# How long after it was sent a ping may still be delivered and join its group, before the clock closes the group
+lateness = 60 * 1000
+
+
+async def follow(chat, queue, on_closed, time_within=time_within, lateness=lateness):
+    # Consumes the pings one chat's sources put on `queue` until a None arrives.
+    # The next ping usually closes the open group, but when a live feed goes quiet past the deadline the group is
+    # closed by the clock, so a finished group is reported without waiting for the next coffee. The clock waits
+    # `lateness` past the deadline, so a ping sent in time but delivered a little late still joins its group instead
+    # of starting a new one. Pings replayed from the past arrive after that, so their groups are only closed by the
+    # next ping or the end of the feed.
+    detector = GroupDetector(chat, time_within)
+    deadline = None
+    while True:
+        try:
+            if deadline is None:
+                ping = await queue.get()
+            else:
+                ping = await asyncio.wait_for(queue.get(), max(deadline - time.time() * 1000, 0) / 1000)
+        except asyncio.TimeoutError:
+            on_closed(detector.close())
+            deadline = None
+            continue
+
+        if ping is None:
+            break
+        if ping.get("content") in coffee_variants:
+            closed = detector.add(ping["timestamp_ms"], ping["sender_name"])
+            if closed is not None:
+                on_closed(closed)
+            deadline = detector.deadline_ms() + lateness
+            deadline = deadline if time.time() * 1000 < deadline else None
+
+    if detector.last_ms is not None:
+        on_closed(detector.close())
+
+
+async def tail_ndjson(path, queue, poll=0.5):
+    # Every line of the file is one message, lines appended later are picked up like tail -f
+    with open(path, encoding="utf-8") as f:
+        partial = ""
+        while True:
+            line = f.readline()
+            if not line:
+                await asyncio.sleep(poll)
+                continue
+            partial += line
+            if not partial.endswith("\n"):
+                continue
+            if partial.strip():
+                await queue.put(json.loads(partial))
+            partial = ""
+
+
+async def serve_socket(path, queue):
+    # Every client writes one message per line, for chats pushing their pings to a local socket
+    async def handle(reader, writer):
+        while line := await reader.readline():
+            if line.strip():
+                await queue.put(json.loads(line))
+        writer.close()
+
+    server = await asyncio.start_unix_server(handle, path)
+    async with server:
+        await server.serve_forever()
+
+
+async def main(sources):
+    # One chat per source: an NDJSON file to tail, or unix:<path> for a socket to listen on
+    states = {}
+
+    def on_closed(group):
+        state = states[group.chat]
+        state.close_group(group.senders)
+        print(
+            f"{group.chat}: group of {group.size} closed at {group.end_ms},",
+            ", ".join(group.members),
+            f"({sum(state.group_sizes.tolist())} groups so far)",
+        )
+
+    tasks = []
+    for source in sources:
+        queue = asyncio.Queue(maxsize=1 << 12)
+        states[source] = AggregateState()
+        if source.startswith("unix:"):
+            tasks.append(serve_socket(source[len("unix:"):], queue))
+        else:
+            tasks.append(tail_ndjson(source, queue))
+        tasks.append(follow(source, queue, on_closed))
+    await asyncio.gather(*tasks)
+
+
+if __name__ == "__main__":
+    asyncio.run(main(sys.argv[1:]))
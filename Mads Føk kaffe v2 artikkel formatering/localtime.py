@@ -0,0 +1,177 @@
+import datetime
+import zoneinfo
+
+import numpy as np
+
+
+timezone = zoneinfo.ZoneInfo("Europe/Copenhagen")
+
+fields = ["day", "year", "month", "monthday", "hour", "minute", "weekday", "week", "yearday"]
+
+
+def utc_offset(second, zone=timezone):
+    return int(datetime.datetime.fromtimestamp(second, tz=zone).utcoffset().total_seconds())
+
+
+def transition_table(first_second, last_second, zone=timezone):
+    # Offsets only change at DST switches, so probe once a day and bisect each change down to the second
+    starts = [np.iinfo(np.int64).min]
+    offsets = [utc_offset(first_second, zone)]
+    probe = first_second
+    while probe < last_second:
+        next_probe = min(probe + 86400, last_second)
+        if utc_offset(next_probe, zone) != offsets[-1]:
+            low, high = probe, next_probe
+            while high - low > 1:
+                middle = (low + high) // 2
+                if utc_offset(middle, zone) == offsets[-1]:
+                    low = middle
+                else:
+                    high = middle
+            starts.append(high)
+            offsets.append(utc_offset(high, zone))
+        probe = next_probe
+    return np.array(starts, dtype=np.int64), np.array(offsets, dtype=np.int64)
+
+
+def days_from_civil(year, month, day):
+    # Howard Hinnant's days_from_civil, vectorized
+    year = year - (month <= 2)
+    era = year // 400
+    year_of_era = year - era * 400
+    day_of_year = (153 * (month + np.where(month > 2, -3, 9)) + 2) // 5 + day - 1
+    day_of_era = year_of_era * 365 + year_of_era // 4 - year_of_era // 100 + day_of_year
+    return era * 146097 + day_of_era - 719468
+
+
+def civil_from_days(days):
+    # Howard Hinnant's civil_from_days, vectorized
+    days = days + 719468
+    era = days // 146097
+    day_of_era = days - era * 146097
+    year_of_era = (day_of_era - day_of_era // 1460 + day_of_era // 36524 - day_of_era // 146096) // 365
+    day_of_year = day_of_era - (365 * year_of_era + year_of_era // 4 - year_of_era // 100)
+    month_shifted = (5 * day_of_year + 2) // 153
+    day = day_of_year - (153 * month_shifted + 2) // 5 + 1
+    month = np.where(month_shifted < 10, month_shifted + 3, month_shifted - 9)
+    year = year_of_era + era * 400 + (month <= 2)
+    return year, month, day
+
+
+def iso_weeks_in_year(year):
+    p = lambda y: (y + y // 4 - y // 100 + y // 400) % 7
+    return np.where((p(year) == 4) | (p(year - 1) == 3), 53, 52)
+
+
+def day_fields(days):
+    year, month, monthday = civil_from_days(days)
+    weekday = (days + 3) % 7
+    yearday = days - days_from_civil(year, 1, 1) + 1
+    week = (yearday - weekday + 9) // 7
+    week = np.where(week < 1, iso_weeks_in_year(year - 1), np.where(week > iso_weeks_in_year(year), 1, week))
+    columns = {"year": year, "month": month, "monthday": monthday, "weekday": weekday, "week": week, "yearday": yearday}
+    return {field: column.astype(np.int16) for field, column in columns.items()}
+
+
+class LocalTime:
+    # Wall clock fields in Europe/Copenhagen, matching to_datetime field by field:
+    #   day       days since 1970-01-01 in local time
+    #   weekday   0 is Monday, like datetime.weekday()
+    #   week      ISO week number, like datetime.isocalendar().week
+    #   yearday   1 is January 1st, like datetime.timetuple().tm_yday
+
+    def __init__(self, **columns):
+        for field in fields:
+            setattr(self, field, columns[field])
+
+    @classmethod
+    def from_timestamps(cls, timestamp_ms, zone=timezone):
+        seconds = np.asarray(timestamp_ms, dtype=np.int64) // 1000
+        if len(seconds) == 0:
+            return cls(**{field: np.zeros(0, dtype=np.int16) for field in fields})
+
+        starts, offsets = transition_table(int(seconds.min()), int(seconds.max()), zone)
+        # starts begins at -inf so the positions are 1 based, pad offsets to match instead of subtracting 1
+        seconds += np.concatenate([offsets[:1], offsets])[np.searchsorted(starts, seconds, side="right")]
+
+        # Count from midnight of the first day, which fits in 32 bits for any chat younger than 68 years
+        first_day = int(seconds.min()) // 86400
+        local = seconds - first_day * 86400
+        if local.max() < np.iinfo(np.int32).max:
+            local = local.astype(np.int32)
+        day_position, second_of_day = np.divmod(local, 86400)
+
+        # Pings span a few thousand days at most, so the calendar is worked out once per day and gathered
+        calendar = day_fields(np.arange(first_day, first_day + int(day_position.max()) + 1))
+
+        return cls(
+            day=(day_position + first_day).astype(np.int32),
+            hour=(second_of_day // 3600).astype(np.int16),
+            minute=(second_of_day % 3600 // 60).astype(np.int16),
+            **{field: column[day_position] for field, column in calendar.items()},
+        )
+
+    def __len__(self):
+        return len(self.day)
+
+    def __getitem__(self, index):
+        return LocalTime(**{field: getattr(self, field)[index] for field in fields})
+
+
+class Calendar:
+    # Every local day from `first_day` up to but not including `last_day`, counted like LocalTime.day.
+    # A day sits at position day - first_day, so per day data is a dense array instead of a dict of dates.
+    #   month_length   days in the month of every day
+
+    def __init__(self, first_day, last_day):
+        self.first_day = first_day
+        self.last_day = last_day
+        self.day = np.arange(first_day, last_day, dtype=np.int32)
+        for field, column in day_fields(self.day.astype(np.int64)).items():
+            setattr(self, field, column)
+        year, month = self.year.astype(np.int64), self.month.astype(np.int64)
+        month_start = days_from_civil(year, month, 1)
+        self.month_length = (days_from_civil(year + month // 12, month % 12 + 1, 1) - month_start).astype(np.int16)
+
+    @classmethod
+    def between(cls, start_ms, end_ms, zone=timezone):
+        # From the day `start_ms` falls on up to the day `end_ms` falls on, which is left out like in a slice
+        start, end = LocalTime.from_timestamps([start_ms, end_ms], zone).day.tolist()
+        return cls(start, end)
+
+    @classmethod
+    def of(cls, local):
+        # From the first to the last day in a LocalTime
+        if len(local) == 0:
+            return cls(0, 0)
+        return cls(int(local.day.min()), int(local.day.max()) + 1)
+
+    def __len__(self):
+        return len(self.day)
+
+    def __repr__(self):
+        return f"Calendar({self.first_day}, {self.last_day})"
+
+    def position(self, days):
+        return np.asarray(days) - self.first_day
+
+    def counts(self, days):
+        # Number of times every day of the calendar occurs in `days`, days outside the calendar are left out
+        position = self.position(days)
+        position = position[(0 <= position) & (position < len(self))]
+        return np.bincount(position, minlength=len(self))
+
+    def counts_by(self, days, keys, key_count):
+        # counts() for every key in range(key_count) at once, one row per key, in a single bincount
+        position = self.position(days)
+        inside = (0 <= position) & (position < len(self))
+        flat = keys[inside].astype(np.int64) * len(self) + position[inside]
+        return np.bincount(flat, minlength=key_count * len(self)).reshape(key_count, len(self))
+
+
+def year_cuts_ms(local, month=9, day=19, zone=timezone):
+    # Midnight on month/day of every year a LocalTime spans, the years of the article run from September 19th
+    if len(local) == 0:
+        return []
+    years = range(int(local.year[0]), int(local.year[-1]) + 1)
+    return [int(datetime.datetime(year, month, day, tzinfo=zone).timestamp()) * 1000 for year in years]
@@ -0,0 +1,178 @@
+import numpy as np
+
+from ingest import load_export, ping_columns
+from localtime import LocalTime
+from groups import find_groups, time_within
+from histograms import Histograms
+from instrument import stage
+
+
+
+class PingTable:
+    # Columnar coffee pings sorted by time: one row per ping, senders interned into `senders`
+
+    def __init__(self, timestamp_ms, sender, variant, senders, local=None):
+        self.timestamp_ms = timestamp_ms
+        self.sender = sender
+        self.variant = variant
+        self.senders = senders
+        self._local = local
+        self._groups = {}
+        self._by_sender = None
+        self._selections = {}
+        self._periods = {}
+        self._histograms = None
+
+    @classmethod
+    def from_pings(cls, pings):
+        return cls.from_parts([ping_columns(pings)])
+
+    @classmethod
+    def from_parts(cls, parts):
+        # One table from the ingest.ping_columns of several files, e.g. ingest.load_export. The files are read as one
+        # message_1.json, newest first with ties in file order, which is the order the senders are interned in.
+        names = {}
+        timestamp_ms, sender, variant = [], [], []
+        for timestamps, senders, variants, part_names in parts:
+            remap = np.array([names.setdefault(name, len(names)) for name in part_names], dtype=np.uint16)
+            timestamp_ms.append(np.frombuffer(timestamps, dtype=np.int64))
+            sender.append(remap[np.frombuffer(senders, dtype=np.uint16)])
+            variant.append(np.frombuffer(variants, dtype=np.uint8))
+        timestamp_ms = np.concatenate(timestamp_ms) if parts else np.zeros(0, dtype=np.int64)
+        sender = np.concatenate(sender) if parts else np.zeros(0, dtype=np.uint16)
+        variant = np.concatenate(variant) if parts else np.zeros(0, dtype=np.uint8)
+        return cls._interned(timestamp_ms, sender, variant, list(names))
+
+    @classmethod
+    def _interned(cls, timestamp_ms, sender, variant, names):
+        # Rows in the order of the export read newest first, sorted by time with ties kept in that order, and the
+        # senders interned by their first ping in it, the order every table of the same pings has
+        newest_first = np.argsort(-timestamp_ms, kind="stable")
+        present, first_seen = np.unique(sender[newest_first], return_index=True)
+        interned = present[np.argsort(first_seen)]
+        rank = np.zeros(len(names), dtype=np.uint16)
+        rank[interned] = np.arange(len(interned))
+        order = newest_first[np.argsort(timestamp_ms[newest_first], kind="stable")]
+        return cls(timestamp_ms[order], rank[sender[order]], variant[order], [names[s] for s in interned.tolist()])
+
+    @classmethod
+    def from_export(cls, directory=".", workers=None):
+        return cls.from_parts(load_export(directory, workers))
+
+    def __len__(self):
+        return len(self.timestamp_ms)
+
+    def __getitem__(self, index):
+        # Slices give views, boolean masks and index arrays give copies
+        local = self._local[index] if self._local is not None else None
+        return PingTable(self.timestamp_ms[index], self.sender[index], self.variant[index], self.senders, local)
+
+    def concatenate(self, later):
+        # Append a table of pings that all come after this one. The senders are interned again, since a new
+        # sender's first ping is among the newest, so the table equals one parsed from the whole export.
+        senders = list(self.senders)
+        ids = {name: i for i, name in enumerate(senders)}
+        for name in later.senders:
+            if name not in ids:
+                ids[name] = len(senders)
+                senders.append(name)
+        remap = np.array([ids[name] for name in later.senders], dtype=np.uint16)
+        return PingTable._interned(
+            np.concatenate([self.timestamp_ms, later.timestamp_ms]),
+            np.concatenate([self.sender, remap[later.sender]]),
+            np.concatenate([self.variant, later.variant]),
+            senders,
+        )
+
+    @property
+    def local(self):
+        # Converted once per table, subsets reuse the fields of the table they were taken from
+        if self._local is None:
+            with stage("local time") as s:
+                self._local = LocalTime.from_timestamps(self.timestamp_ms)
+                s.items = len(self)
+        return self._local
+
+    def groups(self, time_within=time_within):
+        # Grouped once per table and window, so every plot looking at groups shares the same pass
+        if time_within not in self._groups:
+            with stage("groups") as s:
+                self._groups[time_within] = find_groups(self.timestamp_ms, time_within)
+                s.items = len(self)
+        return self._groups[time_within]
+
+    def histograms(self):
+        # Counted once per table, so diffs and comparisons of the same periods are only array arithmetic
+        if self._histograms is None:
+            with stage("histograms") as s:
+                self._histograms = Histograms.of(self)
+                s.items = len(self)
+        return self._histograms
+
+    def periods(self, cuts_ms):
+        # Views of the pings from every cut point up to the next, cuts_ms sorted, memoized per cuts.
+        # The boundaries are binary searched and all the periods' histograms are counted in one pass.
+        # Fewer than two cuts, like the year_cuts_ms of an empty table, have no period between them.
+        cuts_ms = tuple(cuts_ms)
+        if len(cuts_ms) < 2:
+            return []
+        if cuts_ms not in self._periods:
+            bounds = np.searchsorted(self.timestamp_ms, cuts_ms).tolist()
+            periods = [self[first:last] for first, last in zip(bounds, bounds[1:])]
+            with stage("period histograms") as s:
+                for period, histograms in zip(periods, Histograms.of_periods(self, bounds)):
+                    period._histograms = histograms
+                s.items = bounds[-1] - bounds[0]
+            self._periods[cuts_ms] = periods
+        return list(self._periods[cuts_ms])
+
+    def select(self, query):
+        # The pings matching a query.Query, memoized per query. Time ranges, single senders and a sender within a
+        # time range are views, anything else is a copy of the pings in the query's index range that match its mask.
+        if query not in self._selections:
+            with stage("select") as s:
+                selection = query.view(self)
+                if selection is None:
+                    first, last = query.bounds(self)
+                    selection = self[first:last][query.mask(self, first, last)]
+                self._selections[query] = selection
+                s.items = len(selection)
+        return self._selections[query]
+
+    def present_senders(self):
+        # Sender ids that have pings in this table, a subset shares the names of the full table
+        return np.flatnonzero(np.bincount(self.sender, minlength=len(self.senders)))
+
+    def sender_day_counts(self, calendar):
+        # Senders x days matrix of ping counts over a localtime.Calendar, row i belongs to senders[i]
+        return calendar.counts_by(self.local.day, self.sender, len(self.senders))
+
+    def of_sender(self, name, start_ms=None, end_ms=None):
+        # Pings of one sender, optionally only those from start_ms up to end_ms, as a view into the sender index
+        sender = self.sender_id(name)
+        if sender == len(self.senders):
+            return self[:0]
+        by_sender, offsets = self._sender_index()
+        first, last = int(offsets[sender]), int(offsets[sender + 1])
+        times = by_sender.timestamp_ms[first:last]
+        if end_ms is not None:
+            last = first + int(np.searchsorted(times, end_ms))
+        if start_ms is not None:
+            first += int(np.searchsorted(times, start_ms))
+        return by_sender[first:max(first, last)]
+
+    def _sender_index(self):
+        # The pings reordered by sender once, still by time within a sender, and where every sender starts:
+        # pings of sender s are rows offsets[s]:offsets[s + 1]
+        if self._by_sender is None:
+            order = np.argsort(self.sender, kind="stable")
+            offsets = np.concatenate([[0], np.cumsum(np.bincount(self.sender, minlength=len(self.senders)))])
+            self._by_sender = (self[order], offsets)
+        return self._by_sender
+
+    def sender_id(self, name):
+        # A name without pings gets an id no ping has, so its subset is empty like the original list filters
+        return self.senders.index(name) if name in self.senders else len(self.senders)
+
+    def sender_names(self):
+        return [self.senders[s] for s in self.sender.tolist()]
@@ -0,0 +1,170 @@
+import numpy as np
+
+from ingest import variant_code
+
+
+class Query:
+    # A predicate over the pings of a PingTable, combined with &, | and ~ and run with PingTable.select.
+    # Against a table a query compiles to the index range it can be true in, which the time sorted pings give by
+    # binary search, and a boolean mask over that range only. Queries are compared by `key`, so the same subset
+    # asked for twice is looked up instead of recomputed.
+
+    def __init__(self, *key):
+        self.key = (type(self).__name__, *key)
+
+    def __and__(self, other):
+        return And(self, other)
+
+    def __or__(self, other):
+        return Or(self, other)
+
+    def __invert__(self):
+        return Not(self)
+
+    def __eq__(self, other):
+        return isinstance(other, Query) and self.key == other.key
+
+    def __hash__(self):
+        return hash(self.key)
+
+    def __repr__(self):
+        return repr(self.key)
+
+    def bounds(self, pings):
+        # Index range outside of which the query is false
+        return 0, len(pings)
+
+    def mask(self, pings, first, last):
+        # The query for the pings first:last, any range not just bounds()
+        raise NotImplementedError
+
+    def view(self, pings):
+        # The selected pings as a view into `pings`, for queries that are a contiguous range of it
+        return None
+
+
+class Everything(Query):
+    def mask(self, pings, first, last):
+        return np.ones(last - first, dtype=bool)
+
+    def view(self, pings):
+        return pings[:]
+
+
+class Between(Query):
+    # From start_ms up to but not including end_ms, None leaves that side open
+    def __init__(self, start_ms=None, end_ms=None):
+        super().__init__(start_ms, end_ms)
+        self.start_ms = start_ms
+        self.end_ms = end_ms
+
+    def bounds(self, pings):
+        first = 0 if self.start_ms is None else int(np.searchsorted(pings.timestamp_ms, self.start_ms))
+        last = len(pings) if self.end_ms is None else int(np.searchsorted(pings.timestamp_ms, self.end_ms))
+        return first, max(first, last)
+
+    def mask(self, pings, first, last):
+        inside_first, inside_last = self.bounds(pings)
+        mask = np.zeros(last - first, dtype=bool)
+        mask[max(inside_first - first, 0):max(inside_last - first, 0)] = True
+        return mask
+
+    def view(self, pings):
+        first, last = self.bounds(pings)
+        return pings[first:last]
+
+
+class Sender(Query):
+    def __init__(self, *names):
+        super().__init__(*sorted(names))
+        self.names = names
+
+    def mask(self, pings, first, last):
+        ids = [i for i, name in enumerate(pings.senders) if name in self.names]
+        return np.isin(pings.sender[first:last], ids)
+
+    def view(self, pings):
+        if len(self.names) == 1 and self.names[0] in pings.senders:
+            return pings.of_sender(self.names[0])
+        return None
+
+
+class Variant(Query):
+    # The coffee emojis from ingest.coffee_variants
+    def __init__(self, *variants):
+        super().__init__(*sorted(variants))
+        self.codes = [variant_code[variant] for variant in variants]
+
+    def mask(self, pings, first, last):
+        return np.isin(pings.variant[first:last], self.codes)
+
+
+class Weekday(Query):
+    # 0 is Monday, like LocalTime.weekday
+    def __init__(self, *weekdays):
+        super().__init__(*sorted(weekdays))
+        self.weekdays = weekdays
+
+    def mask(self, pings, first, last):
+        return np.isin(pings.local.weekday[first:last], self.weekdays)
+
+
+class Hour(Query):
+    # Local hours of the day, e.g. Hour(*range(7, 17)) for working hours
+    def __init__(self, *hours):
+        super().__init__(*sorted(hours))
+        self.hours = hours
+
+    def mask(self, pings, first, last):
+        return np.isin(pings.local.hour[first:last], self.hours)
+
+
+class And(Query):
+    def __init__(self, left, right):
+        super().__init__(left.key, right.key)
+        self.left = left
+        self.right = right
+
+    def bounds(self, pings):
+        left_first, left_last = self.left.bounds(pings)
+        right_first, right_last = self.right.bounds(pings)
+        first = max(left_first, right_first)
+        return first, max(first, min(left_last, right_last))
+
+    def mask(self, pings, first, last):
+        return self.left.mask(pings, first, last) & self.right.mask(pings, first, last)
+
+    def view(self, pings):
+        # A time range within a view is still a view, e.g. one sender within a period
+        for outer, inner in (self.left, self.right), (self.right, self.left):
+            if isinstance(inner, Between) and (outer_view := outer.view(pings)) is not None:
+                return inner.view(outer_view)
+        return None
+
+
+class Or(Query):
+    def __init__(self, left, right):
+        super().__init__(left.key, right.key)
+        self.left = left
+        self.right = right
+
+    def bounds(self, pings):
+        left_first, left_last = self.left.bounds(pings)
+        right_first, right_last = self.right.bounds(pings)
+        if left_first == left_last:
+            return right_first, right_last
+        if right_first == right_last:
+            return left_first, left_last
+        return min(left_first, right_first), max(left_last, right_last)
+
+    def mask(self, pings, first, last):
+        return self.left.mask(pings, first, last) | self.right.mask(pings, first, last)
+
+
+class Not(Query):
+    def __init__(self, query):
+        super().__init__(query.key)
+        self.query = query
+
+    def mask(self, pings, first, last):
+        return ~self.query.mask(pings, first, last)
@@ -0,0 +1,223 @@
+import io
+import os
+import ast
+import sys
+import json
+import time
+import types
+import hashlib
+import inspect
+import contextlib
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import matplotlib.pyplot as plt
+
+import instrument
+from pings import PingTable
+
+
+# The article includes the figures as .pgf, which needs xelatex to write, "png" only needs matplotlib
+plot_format = "pgf"
+
+def plot_path(name):
+    return f"plot_{name}.{plot_format}"
+
+
+class Figure:
+    # One call of a plot function, described up front so it can be rendered anywhere
+
+    def __init__(self, plot, *args, **kwargs):
+        self.plot = plot
+        self.args = args
+        self.kwargs = kwargs
+
+    def key(self, digests=None):
+        # Everything the picture depends on: the plot function, the code it shares with the other plots, its inputs
+        # and the font size it starts from
+        digests = {} if digests is None else digests
+        digest = hashlib.sha256(self.plot.__qualname__.encode())
+        digest.update(_project_code(self.plot, digests))
+        digest.update(_digest(self.args, digests))
+        digest.update(_digest(self.kwargs, digests))
+        digest.update(repr(plt.rcParams["font.size"]).encode())
+        return digest.hexdigest()
+
+    def render(self):
+        # The file names come from plt.set_name, so record them as the plot sets them
+        names = []
+        set_name = plt.set_name
+        def recording_set_name(name):
+            names.append(name)
+            set_name(name)
+        plt.set_name = recording_set_name
+        try:
+            with instrument.stage(f"plot {self.plot.__name__}") as s:
+                self.plot(*self.args, **self.kwargs)
+                s.items = len(names)
+        finally:
+            plt.set_name = set_name
+        return names
+
+
+def _source(function):
+    try:
+        return inspect.getsource(function).encode()
+    except OSError:
+        return function.__code__.co_code
+
+
+def _project_code(function, digests):
+    # The code of the plot's module and of every module of the project it imports, directly or through another one,
+    # since helpers like add_labels, the styling in save() and the counting in histograms.py change pictures without
+    # touching the plot function. The modules are compared as syntax trees, so comments do not count, and neither do
+    # the `__main__` block and the upper case settings of an entry point like PROFILE or RENDER_WORKERS. That way
+    # analyse.py and cli.py plot share their cached figures.
+    try:
+        module_path = os.path.abspath(inspect.getsourcefile(function))
+    except TypeError:
+        return _source(function)
+    if ("project", module_path) not in digests:
+        folder = os.path.dirname(module_path)
+        trees = {}
+        todo = [module_path]
+        while todo:
+            path = todo.pop()
+            if path not in trees:
+                trees[path] = _module_tree(path)
+                todo.extend(_project_imports(trees[path], folder))
+        digest = hashlib.sha256()
+        for path, tree in sorted(trees.items()):
+            digest.update(os.path.basename(path).encode() + ast.dump(tree).encode())
+        digests["project", module_path] = digest.digest()
+    return digests["project", module_path]
+
+
+def _module_tree(path):
+    with open(path, "rb") as f:
+        tree = ast.parse(f.read())
+    main = ast.dump(ast.parse('__name__ == "__main__"', mode="eval").body)
+    tree.body = [
+        node for node in tree.body
+        if not (isinstance(node, ast.If) and ast.dump(node.test) == main)
+        and not (isinstance(node, ast.Assign) and all(isinstance(t, ast.Name) and t.id.isupper() for t in node.targets))
+    ]
+    return tree
+
+
+def _project_imports(tree, folder):
+    # Paths of the modules in `folder` the tree imports, wherever the import statement is
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names = [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.level == 0 and node.module:
+            names = [node.module]
+        else:
+            continue
+        for name in names:
+            path = os.path.join(folder, name.replace(".", os.sep) + ".py")
+            if os.path.exists(path):
+                yield path
+
+
+def _digest(value, digests):
+    # The same ping table goes into many figures, so its columns are only hashed once per render
+    if id(value) in digests:
+        return digests[id(value)][1]
+
+    # Columns read from .ping_cache are memmaps, and must hash like the arrays of a freshly parsed table
+    digest = hashlib.sha256((np.ndarray if isinstance(value, np.ndarray) else type(value)).__name__.encode())
+    if isinstance(value, np.ndarray):
+        digest.update(f"{value.dtype}{value.shape}".encode())
+        digest.update(np.ascontiguousarray(value).data)
+    elif isinstance(value, PingTable):
+        for column in value.timestamp_ms, value.sender, value.variant, value.senders:
+            digest.update(_digest(column, digests))
+    elif isinstance(value, (list, tuple)):
+        for item in value:
+            digest.update(_digest(item, digests))
+    elif isinstance(value, dict):
+        for key, item in sorted(value.items()):
+            digest.update(_digest(key, digests) + _digest(item, digests))
+    elif isinstance(value, types.FunctionType):
+        digest.update(_source(value))
+    else:
+        digest.update(repr(value).encode())
+
+    # Keep the value alive so its id is not reused while the digest is remembered
+    digests[id(value)] = (value, digest.digest())
+    return digests[id(value)][1]
+
+
+_figures = None
+
+def _set_figures(figures):
+    global _figures
+    _figures = figures
+    # Forked workers start with a copy of the records so far, which the main process already has
+    instrument.take()
+
+def _render_capturing(figure):
+    # What the plot prints, like its statistics, is kept with its file names so a cache hit can print it again
+    output = io.StringIO()
+    try:
+        with contextlib.redirect_stdout(output):
+            names = figure.render()
+    except BaseException:
+        sys.stdout.write(output.getvalue())
+        raise
+    return {"names": names, "output": output.getvalue()}
+
+def _render(i):
+    return _render_capturing(_figures[i]), instrument.take()
+
+
+def render(figures, workers=None, cache=None):
+    # workers=None uses every core, workers=0 renders in this process one figure at a time.
+    # With a cache file, figures whose key and output files are unchanged since they were last rendered are skipped
+    # and only print what they printed when they were rendered.
+    start = time.time()
+
+    manifest = {}
+    if cache is not None and os.path.exists(cache):
+        with open(cache) as f:
+            manifest = json.load(f)
+    digests = {}
+    keys = [figure.key(digests) if cache is not None else None for figure in figures]
+    todo = [
+        i for i, key in enumerate(keys)
+        if not isinstance(manifest.get(key), dict)
+        or not all(os.path.exists(plot_path(name)) for name in manifest[key]["names"])
+    ]
+
+    if workers == 0 or len(todo) <= 1:
+        results = [_render_capturing(figures[i]) for i in todo]
+    else:
+        # Forked workers inherit the figures and their data, so nothing is pickled per figure
+        context = multiprocessing.get_context("fork") if "fork" in multiprocessing.get_all_start_methods() else None
+        workers = min(workers or os.cpu_count(), len(todo))
+        with ProcessPoolExecutor(workers, context, initializer=_set_figures, initargs=(figures,)) as pool:
+            results = []
+            for result, records in pool.map(_render, todo):
+                results.append(result)
+                instrument.extend(records)
+
+    # Printed in the order of the figures, whether they were rendered now or before
+    rendered = dict(zip(todo, results))
+    for i, key in enumerate(keys):
+        sys.stdout.write(rendered[i]["output"] if i in rendered else manifest[key]["output"])
+
+    names = [result["names"] for result in results]
+    print(f"Rendered {sum(map(len, names))} plots from {len(todo)} figures in {time.time() - start:.1f}s")
+    if cache is not None:
+        hits = len(figures) - len(todo)
+        print(f"Figure cache: {hits} of {len(figures)} figures unchanged ({hits / max(len(figures), 1):.0%} hit rate)")
+        # Entries of figures rendered elsewhere, like a single `cli.py plot`, are kept unless their files were just
+        # written over
+        written = {name for result in results for name in result["names"]}
+        manifest = {key: entry for key, entry in manifest.items() if isinstance(entry, dict) and not written & set(entry["names"])}
+        manifest.update((keys[i], result) for i, result in rendered.items())
+        with open(cache, "w") as f:
+            json.dump(manifest, f, indent=1)
+    return names
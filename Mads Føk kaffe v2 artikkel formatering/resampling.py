@@ -0,0 +1,88 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+
+chunk_replicates = 1000
+
+
+class Comparison:
+    # How one histogram bin differs between two periods, shaped like the histogram:
+    #   difference   share of period 2's pings in the bin minus the share of period 1's
+    #   p_value      two sided permutation test of the difference, from swapping pings between the periods
+    #   low, high    bootstrap confidence band of the difference, from resampling each period's pings
+
+    def __init__(self, difference, p_value, low, high):
+        self.difference = difference
+        self.p_value = p_value
+        self.low = low
+        self.high = high
+
+
+def _shares(counts):
+    return counts / np.maximum(counts.sum(axis=-1, keepdims=True), 1)
+
+
+def _replicates(counts_1, counts_2, replicates, seed):
+    # Both kinds of replicates for one chunk, every replicate a row.
+    # Swapping pings between the periods draws period 1's bins from the pooled bins without replacement, which is
+    # a multivariate hypergeometric draw. Resampling a period's pings with replacement is a multinomial draw.
+    rng = np.random.default_rng(seed)
+    n_1, n_2 = int(counts_1.sum()), int(counts_2.sum())
+    pooled = counts_1 + counts_2
+    permuted_1 = rng.multivariate_hypergeometric(pooled, n_1, size=replicates)
+    permuted = _shares(pooled - permuted_1) - _shares(permuted_1)
+    resampled_1 = rng.multinomial(n_1, _shares(counts_1), size=replicates)
+    resampled_2 = rng.multinomial(n_2, _shares(counts_2), size=replicates)
+    bootstrapped = _shares(resampled_2) - _shares(resampled_1)
+    return permuted, bootstrapped
+
+
+def _replicates_star(args):
+    return _replicates(*args)
+
+
+def compare(histogram_1, histogram_2, **options):
+    # Permutation p-values and bootstrap bands for every bin of two count histograms of the same shape
+    return compare_all([(histogram_1, histogram_2)], **options)[0]
+
+
+def compare_all(pairs, replicates=10000, confidence=0.95, workers=None, seed=None):
+    # compare() for a list of histogram pairs at once. The replicates of every pair are drawn in chunks, which are
+    # all spread over one process pool, workers=0 draws them in this process.
+    flat_pairs = [
+        (np.asarray(histogram_1, dtype=np.int64).ravel(), np.asarray(histogram_2, dtype=np.int64).ravel())
+        for histogram_1, histogram_2 in pairs
+    ]
+    chunks = [min(chunk_replicates, replicates - start) for start in range(0, replicates, chunk_replicates)]
+    seeds = iter(np.random.SeedSequence(seed).spawn(len(pairs) * len(chunks)))
+    tasks = [(counts_1, counts_2, chunk, next(seeds)) for counts_1, counts_2 in flat_pairs for chunk in chunks]
+    if workers == 0 or len(tasks) <= 1:
+        results = [_replicates_star(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(min(workers or os.cpu_count(), len(tasks))) as pool:
+            results = list(pool.map(_replicates_star, tasks))
+
+    comparisons = []
+    for i, ((histogram_1, _), (counts_1, counts_2)) in enumerate(zip(pairs, flat_pairs)):
+        pair_results = results[i * len(chunks):(i + 1) * len(chunks)]
+        permuted = np.concatenate([permuted for permuted, _ in pair_results])
+        bootstrapped = np.concatenate([bootstrapped for _, bootstrapped in pair_results])
+        difference = _shares(counts_2) - _shares(counts_1)
+
+        # Counting the observed split among the permutations keeps the p-values above 0
+        extreme = (np.abs(permuted) >= np.abs(difference) - 1e-12).sum(axis=0)
+        p_value = (extreme + 1) / (replicates + 1)
+        tail = (1 - confidence) / 2
+        low, high = np.quantile(bootstrapped, [tail, 1 - tail], axis=0)
+        shape = np.shape(histogram_1)
+        comparisons.append(Comparison(*(array.reshape(shape) for array in (difference, p_value, low, high))))
+    return comparisons
+
+
+def compare_periods(pings_1, pings_2, fields=("weekday", "month", "weekday_hour"), **options):
+    # compare() for several of the periods' calendar histograms, see histograms.shapes for the fields
+    histograms_1, histograms_2 = pings_1.histograms(), pings_2.histograms()
+    pairs = [(getattr(histograms_1, field), getattr(histograms_2, field)) for field in fields]
+    return dict(zip(fields, compare_all(pairs, **options)))
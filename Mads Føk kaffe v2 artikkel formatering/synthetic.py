@@ -0,0 +1,114 @@
+import os
+import json
+import datetime
+
+import numpy as np
+
+from ingest import coffee_emoji, coffee_emoji_steffan, coffee_emoji_no_tail
+from localtime import timezone, LocalTime
+
+
+# Relative chance of a coffee trip starting in every hour of the day, Monday first, peaking mid morning and after lunch
+hour_profile = np.array([0, 0, 0, 0, 0, 0, 0, 1, 3, 6, 8, 6, 3, 6, 8, 6, 3, 1, 1, 0.5, 0.5, 0.2, 0, 0])
+weekday_profile = np.array([1, 1, 1, 1, 0.8, 0.15, 0.1])
+
+first_names = ["Søren", "Åse", "Jørgen", "Mette", "Bjørn", "Ærtebjerg", "Lasse", "Louise", "Casper", "Signe", "Mads", "Frida"]
+last_names = ["Sølvsten", "Hansen", "Højgaard", "Dohn", "Bæk", "Rysgaard", "Kjær", "Østergaard"]
+
+# Shares of the coffee pings sent with each emoji, the rest of the messages are ordinary chat
+variant_shares = {coffee_emoji: 0.8, coffee_emoji_no_tail: 0.15, coffee_emoji_steffan: 0.05}
+ping_share = 0.9
+
+
+def sender_names(count, seed=0):
+    # Danish names the way Messenger exports them: UTF-8 bytes read as Latin-1
+    rng = np.random.default_rng(seed)
+    names = []
+    for i in range(count):
+        name = f"{first_names[rng.integers(len(first_names))]} {last_names[rng.integers(len(last_names))]} {i}"
+        names.append(name.encode("utf-8").decode("latin-1"))
+    return names
+
+
+def trips(count, start, weeks, rng):
+    # Start times of `count` coffee trips spread over `weeks` weeks from `start` on, in seconds.
+    # Trips arrive at random within every hour at a rate following the weekday and hour profiles.
+    profile = np.outer(weekday_profile, hour_profile).ravel()
+    profile /= profile.sum()
+    week = rng.integers(weeks, size=count)
+    hour_of_week = rng.choice(len(profile), size=count, p=profile)
+
+    # Counted from midnight of the Monday of the start week, with trips before `start` moved to the last week
+    local = LocalTime.from_timestamps([int(start.timestamp() * 1000)])
+    monday = start.timestamp() - int(local.weekday[0]) * 86400 - int(local.hour[0]) * 3600 - int(local.minute[0]) * 60 - start.second
+    seconds = monday + week * 604800 + hour_of_week * 3600 + rng.uniform(0, 3600, size=count)
+    seconds[seconds < start.timestamp()] += weeks * 604800
+    return np.sort(seconds)
+
+
+def messages(count, sender_count, start, weeks, rng):
+    # Columns of `count` messages over `weeks` weeks from `start` on, oldest first: timestamp_ms, sender index and
+    # content, where content is None for chat messages. Every trip is a group of pings seconds to minutes apart,
+    # most of them from the regulars.
+    group_size = rng.geometric(0.45, size=count)
+    group_size = group_size[:np.searchsorted(np.cumsum(group_size), count) + 1]
+    group_size[-1] -= group_size.sum() - count
+
+    group_start = trips(len(group_size), start, weeks, rng)
+    delay = rng.exponential(60, size=count)
+    first_in_group = np.concatenate([[0], np.cumsum(group_size)[:-1]])
+    delay[first_in_group] = 0
+    elapsed = np.cumsum(delay)
+    within = elapsed - np.repeat(elapsed[first_in_group], group_size)
+    timestamp_ms = (np.repeat(group_start, group_size) + within) * 1000 + rng.integers(0, 1000, size=count)
+    timestamp_ms = np.sort(timestamp_ms.astype(np.int64))
+
+    popularity = 1 / np.arange(1, sender_count + 1) ** 0.8
+    sender = rng.choice(sender_count, size=count, p=popularity / popularity.sum())
+    variants = list(variant_shares)
+    variant = rng.choice(len(variants), size=count, p=list(variant_shares.values()))
+    is_ping = rng.random(count) < ping_share
+    content = [variants[v] if ping else None for v, ping in zip(variant.tolist(), is_ping.tolist())]
+    return timestamp_ms, sender, content
+
+
+def _write_file(directory, file_number, participants, lines):
+    lines.reverse()
+    with open(os.path.join(directory, f"message_{file_number}.json"), "w") as f:
+        f.write('{"participants": [%s], "messages": [\n' % participants)
+        f.write(",\n".join(lines))
+        f.write('\n], "title": "Coffee", "is_still_participant": true, "thread_path": "inbox/coffee", "magic_words": []}')
+
+
+def write_export(directory, count, sender_count=20, years=2, per_file=100_000, seed=0, chunk=1_000_000,
+                 start=datetime.datetime(2022, 9, 19, tzinfo=timezone)):
+    # A Messenger export of `count` messages over about `years` years as message_1.json, message_2.json, ... with
+    # the newest messages in message_1.json and every file newest first. Bigger exports are busier chats rather than
+    # longer ones. Generated in chunks continuing from one another, so sizes up to 10^8 never hold more than a chunk
+    # and a file of messages in memory.
+    os.makedirs(directory, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    names = sender_names(sender_count, seed)
+    quoted = [json.dumps(name) for name in names]
+    participants = ", ".join('{"name": %s}' % name for name in quoted)
+
+    file_number = -(-count // per_file)
+    lines = []
+    written = 0
+    while written < count:
+        size = min(chunk, count - written)
+        weeks = max(1, round(years * 52 * size / count))
+        timestamp_ms, sender, content = messages(size, sender_count, start, weeks, rng)
+        start = datetime.datetime.fromtimestamp(int(timestamp_ms[-1]) // 1000 + 1, tz=timezone)
+        for t, s, c in zip(timestamp_ms.tolist(), sender.tolist(), content):
+            if c is None:
+                lines.append(f'{{"sender_name": {quoted[s]}, "timestamp_ms": {t}, "content": "hej", "is_geoblocked_for_viewer": false}}')
+            else:
+                lines.append(f'{{"sender_name": {quoted[s]}, "timestamp_ms": {t}, "content": {json.dumps(c)}, "is_geoblocked_for_viewer": false}}')
+            if len(lines) == per_file:
+                _write_file(directory, file_number, participants, lines)
+                file_number, lines = file_number - 1, []
+        written += size
+    if lines:
+        _write_file(directory, file_number, participants, lines)
+    return names
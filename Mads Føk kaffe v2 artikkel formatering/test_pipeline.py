@@ -0,0 +1,151 @@
+import os
+import json
+import asyncio
+import datetime
+
+import numpy as np
+import pytest
+
+from synthetic import write_export
+from ingest import iter_messages, export_files, coffee_variants
+from pings import PingTable
+from cache import load_pings
+from localtime import LocalTime, timezone, year_cuts_ms
+from groups import find_groups, group_size_sweep
+from histograms import Histograms
+from live import AggregateState, follow
+
+
+# The pipeline checked against the plain way of doing each step, on small synthetic exports
+
+
+@pytest.fixture(scope="module")
+def export(tmp_path_factory):
+    directory = tmp_path_factory.mktemp("export")
+    write_export(str(directory), 20_000, sender_count=12, per_file=7_000, seed=1)
+    return directory
+
+
+def assert_same_table(a, b):
+    assert np.array_equal(a.timestamp_ms, b.timestamp_ms)
+    assert np.array_equal(a.sender, b.sender)
+    assert np.array_equal(a.variant, b.variant)
+    assert a.senders == b.senders
+
+
+def write_messages(directory, export, messages):
+    # A copy of the export with other messages in message_1.json, the other files are linked
+    for file in os.listdir(export):
+        if file.startswith("message_") and not os.path.exists(directory / file):
+            os.link(export / file, directory / file)
+    with open(export / "message_1.json", encoding="utf-8") as f:
+        newest = json.load(f)
+    os.remove(directory / "message_1.json")
+    with open(directory / "message_1.json", "w", encoding="utf-8") as f:
+        json.dump(dict(newest, messages=messages), f)
+
+
+def newest_messages(export):
+    with open(export / "message_1.json", encoding="utf-8") as f:
+        return json.load(f)["messages"]
+
+
+def test_append_equals_full_parse(export, tmp_path):
+    # The export without its newest messages is cached first, then the full re-export is appended to it
+    messages = newest_messages(export)
+    write_messages(tmp_path, export, messages[3_000:])
+    load_pings(str(tmp_path))
+
+    write_messages(tmp_path, export, messages)
+    appended = load_pings(str(tmp_path), append=True)
+    assert_same_table(appended, PingTable.from_export(str(export)))
+    assert_same_table(load_pings(str(tmp_path)), appended)
+
+
+def test_append_keeps_pings_sharing_the_newest_millisecond(export, tmp_path):
+    # A new ping sent in the same millisecond as the newest cached one
+    messages = newest_messages(export)
+    pings = [i for i, message in enumerate(messages) if message["content"] != "hej"]
+    new, cached = pings[0], pings[1]
+    messages[new]["timestamp_ms"] = messages[cached]["timestamp_ms"]
+    write_messages(tmp_path, export, messages[cached:])
+    load_pings(str(tmp_path))
+
+    write_messages(tmp_path, export, messages)
+    appended = load_pings(str(tmp_path), append=True)
+    assert_same_table(appended, PingTable.from_export(str(tmp_path)))
+    assert len(appended) == len(load_pings(str(tmp_path))) == len(PingTable.from_export(str(export)))
+
+    # A re-export without new messages keeps the table and its key
+    write_messages(tmp_path, export, messages)
+    assert_same_table(load_pings(str(tmp_path), append=True), appended)
+    assert len(os.listdir(tmp_path / ".ping_cache")) == 2
+
+
+def test_periods_of_fewer_than_two_cuts():
+    empty = PingTable.from_pings([])
+    assert empty.periods(year_cuts_ms(empty.local)) == []
+    assert empty.periods([0]) == []
+    assert Histograms.of_periods(empty, []) == []
+
+
+@pytest.mark.parametrize("chunk_size", [7, 1 << 20])
+def test_parser_equals_json_load(export, chunk_size):
+    # Small chunks end the buffer inside strings, escapes and numbers
+    for path in export_files(str(export)):
+        with open(path, encoding="utf-8") as f:
+            assert list(iter_messages(path, chunk_size)) == json.load(f)["messages"]
+
+
+def test_local_time_equals_datetime_across_dst(export):
+    # Every minute around both switches of 2023, the ambiguous autumn hour included, and the export's pings
+    switches = [datetime.datetime(2023, 3, 26, 1), datetime.datetime(2023, 10, 29, 1)]
+    switches_ms = [int(switch.replace(tzinfo=datetime.timezone.utc).timestamp()) * 1000 for switch in switches]
+    minutes = [np.arange(-6 * 3600, 6 * 3600, 59) * 1000 + switch_ms for switch_ms in switches_ms]
+    timestamp_ms = np.concatenate(minutes + [PingTable.from_export(str(export)).timestamp_ms])
+    local = LocalTime.from_timestamps(timestamp_ms)
+
+    for i, ms in enumerate(timestamp_ms.tolist()):
+        t = datetime.datetime.fromtimestamp(ms // 1000, tz=timezone)
+        fields = (t.year, t.month, t.day, t.hour, t.minute, t.weekday(), t.isocalendar().week, t.timetuple().tm_yday)
+        assert fields == (
+            local.year[i], local.month[i], local.monthday[i], local.hour[i], local.minute[i],
+            local.weekday[i], local.week[i], local.yearday[i],
+        )
+        assert local.day[i] == (t.date() - datetime.date(1970, 1, 1)).days
+
+
+def test_sweep_equals_find_groups(export):
+    thresholds = [1, 30 * 1000, 5 * 60 * 1000, 5 * 60 * 1000 + 1, 3600 * 1000]
+    for sorted_time in [PingTable.from_export(str(export)).timestamp_ms, np.zeros(0, dtype=np.int64), np.array([5])]:
+        size_counts = group_size_sweep(sorted_time, thresholds)
+        for threshold in thresholds:
+            assert np.array_equal(size_counts[threshold], find_groups(sorted_time, threshold).size_count)
+
+
+def test_live_equals_batch(export):
+    # The pings replayed in time order through the live detector, long past their deadlines
+    pings = PingTable.from_export(str(export))
+    queue = asyncio.Queue()
+    for timestamp_ms, sender in zip(pings.timestamp_ms.tolist(), pings.sender.tolist()):
+        ping = {"content": coffee_variants[0], "sender_name": pings.senders[sender], "timestamp_ms": timestamp_ms}
+        queue.put_nowait(ping)
+    queue.put_nowait({"content": "hej", "sender_name": pings.senders[0], "timestamp_ms": 0})
+    queue.put_nowait(None)
+
+    closed = []
+    state = AggregateState()
+
+    def on_closed(group):
+        closed.append(group)
+        state.close_group(group.senders)
+
+    asyncio.run(follow("chat", queue, on_closed))
+    groups = pings.groups()
+    assert [group.size for group in closed] == groups.size.tolist()
+    assert [group.start_ms for group in closed] == pings.timestamp_ms[groups.start].tolist()
+    assert [group.senders for group in closed] == [
+        [pings.senders[sender] for sender in pings.sender[start:end].tolist()]
+        for start, end in zip(groups.start.tolist(), groups.end.tolist())
+    ]
+    assert np.array_equal(state.group_sizes, groups.size_count)